@@ -133,7 +133,9 @@ Original Comments
 > 	- dwh
 """
 
-import math, re, socket, select, string, struct, sys, threading, time, types
+import errno, heapq, math, os, re, socket, select, string, struct, sys, threading, time, types
+import Queue
+from collections import deque
 from SocketServer import UDPServer, DatagramRequestHandler, ForkingMixIn, ThreadingMixIn
 
 global version
@@ -658,6 +660,44 @@ class OSCBundle(OSCMessage):
 		copy.timetag = self.timetag
 		return copy
 
+class OSCMessageTemplate(object):
+	"""Pre-encoded OSC-message with a fixed address & fixed typetags.
+
+	The (zero-padded) address and typetag-string are encoded once, when the template
+	is created. getBinary() then only packs the arguments behind that prefix,
+	which makes this the cheap way to repeatedly send the same kind of message:
+	  >>> fader = OSCMessageTemplate("/ch/01/mix/fader", "i")
+	  >>> msg = OSCMessage("/ch/01/mix/fader")
+	  >>> msg.append(512)
+	  >>> fader.getBinary(512) == msg.getBinary()
+	  True
+
+	Only fixed-size 'i' (int32) and 'f' (float32) typetags are supported.
+	"""
+	def __init__(self, address, typetags=""):
+		"""Instantiate a new OSCMessageTemplate for the given OSC-address.
+		'typetags' is the string of typetags (without the leading ',') of the arguments
+		getBinary() will be called with.
+		"""
+		for tag in typetags:
+			if tag not in ('i', 'f'):
+				raise OSCError("OSCMessageTemplate only supports 'i' and 'f' typetags, not '%s'" % tag)
+
+		self.address = address
+		self.typetags = "," + typetags
+		self.prefix = OSCString(address) + OSCString(self.typetags)
+		self._struct = struct.Struct(">" + typetags)
+
+	def getBinary(self, *args):
+		"""Returns the binary representation of the message with the given arguments
+		"""
+		return self.prefix + self._struct.pack(*args)
+
+	def __str__(self):
+		"""Returns the template's address and typetags as a string.
+		"""
+		return "%s %s" % (self.address, self.typetags)
+
 ######
 #
 # OSCMessage encoding functions
@@ -670,8 +710,8 @@ def OSCString(next):
 	The string ends with 1 to 4 zero-bytes ('\x00') 
 	"""
 	
-	OSCstringLength = math.ceil((len(next)+1) / 4.0) * 4
-	return struct.pack(">%ds" % (OSCstringLength), str(next))
+	next = str(next)
+	return next + "\0" * (4 - (len(next) & 3))
 
 def OSCBlob(next):
 	"""Convert a string into an OSC Blob.
@@ -808,12 +848,84 @@ def _readFloat(data):
 
 	return (float, rest)
 
-def decodeOSC(data):
-	"""Converts a binary OSC message to a Python list. 
+######
+#
+# Offset-based OSCMessage decoding functions
+#
+######
+
+# precompiled unpackers, shared by the offset-based decoders below
+_int32Struct = struct.Struct(">i")
+_float32Struct = struct.Struct(">f")
+_timeTagStruct = struct.Struct(">ll")
+
+def _decodeString(data, offset, end):
+	"""Reads the (null-terminated) string starting at 'offset'.
+	Returns a (string, next_offset) tuple
+	"""
+	stop = data.find("\0", offset, end)
+	if stop < 0:
+		return (data[offset:end], end)
+
+	return (data[offset:stop], offset + ((stop - offset) & ~3) + 4)
+
+def _decodeBlob(data, offset, end):
+	"""Reads the (numbered) block of data starting at 'offset'.
+	Returns a (blob, next_offset) tuple
+	"""
+	if (end - offset) < 4:
+		raise OSCError("OSC-blob size is truncated")
+
+	length = _int32Struct.unpack_from(data, offset)[0]
+	start = offset + 4
+	if (length < 0) or (length > end - start):
+		raise OSCError("OSC-blob size %d is out of range" % length)
+
+	return (data[start:start + length], start + ((length + 3) & ~3))
+
+def _decodeInt(data, offset, end):
+	"""Interprets the 4 bytes at 'offset' as a 32-bit integer.
+	Returns an (integer, next_offset) tuple
+	"""
+	if (end - offset) < 4:
+		print "Error: too few bytes for int", data[offset:end], end - offset
+		return (0, end)
+
+	return (_int32Struct.unpack_from(data, offset)[0], offset + 4)
+
+def _decodeFloat(data, offset, end):
+	"""Interprets the 4 bytes at 'offset' as a 32-bit float.
+	Returns a (float, next_offset) tuple
+	"""
+	if (end - offset) < 4:
+		print "Error: too few bytes for float", data[offset:end], end - offset
+		return (0, end)
+
+	return (_float32Struct.unpack_from(data, offset)[0], offset + 4)
+
+def _decodeTimeTag(data, offset, end):
+	"""Interprets the 8 bytes at 'offset' as a TimeTag.
+	Returns a (time, next_offset) tuple
+	"""
+	if (end - offset) < 8:
+		raise OSCError("OSCBundle timetag is truncated")
+
+	high, low = _timeTagStruct.unpack_from(data, offset)
+	if (high == 0) and (low <= 1):
+		time = 0.0
+	else:
+		time = int(high) + float(low / 1e9)
+
+	return (time, offset + 8)
+
+_decodeTable = {"i":_decodeInt, "f":_decodeFloat, "s":_decodeString, "b":_decodeBlob}
+
+def _decodePacket(data, offset, end):
+	"""Decodes the OSC-packet occupying data[offset:end] without copying
+	the remaining data after each field.
 	"""
-	table = {"i":_readInt, "f":_readFloat, "s":_readString, "b":_readBlob}
 	decoded = []
-	address,  rest = _readString(data)
+	address, offset = _decodeString(data, offset, end)
 	if address.startswith(","):
 		typetags = address
 		address = ""
@@ -821,28 +933,57 @@ def decodeOSC(data):
 		typetags = ""
 
 	if address == "#bundle":
-		time, rest = _readTimeTag(rest)
+		time, offset = _decodeTimeTag(data, offset, end)
 		decoded.append(address)
 		decoded.append(time)
-		while len(rest)>0:
-			length, rest = _readInt(rest)
-			decoded.append(decodeOSC(rest[:length]))
-			rest = rest[length:]
-
-	elif len(rest)>0:
+		while offset < end:
+			if (end - offset) < 4:
+				raise OSCError("OSCBundle element size is truncated")
+			length = _int32Struct.unpack_from(data, offset)[0]
+			offset += 4
+			if (length < 0) or (offset + length > end):
+				raise OSCError("OSCBundle element size %d is out of range" % length)
+			decoded.append(_decodePacket(data, offset, offset + length))
+			offset += length
+
+	elif offset < end:
 		if not len(typetags):
-			typetags, rest = _readString(rest)
+			typetags, offset = _decodeString(data, offset, end)
 		decoded.append(address)
 		decoded.append(typetags)
 		if typetags.startswith(","):
+			# ints & floats are by far the most common arguments; unpack those inline
+			table = _decodeTable
+			unpackInt = _int32Struct.unpack_from
+			unpackFloat = _float32Struct.unpack_from
+			append = decoded.append
 			for tag in typetags[1:]:
-				value, rest = table[tag](rest)
-				decoded.append(value)
+				if (tag == "i") and (end - offset) >= 4:
+					append(unpackInt(data, offset)[0])
+					offset += 4
+				elif (tag == "f") and (end - offset) >= 4:
+					append(unpackFloat(data, offset)[0])
+					offset += 4
+				else:
+					value, offset = table[tag](data, offset, end)
+					append(value)
 		else:
 			raise OSCError("OSCMessage's typetag-string lacks the magic ','")
 
 	return decoded
 
+def decodeOSC(data):
+	"""Converts a binary OSC message to a Python list.
+	'data' may be a string, or a memoryview / bytearray / buffer of a received packet.
+	"""
+	if not isinstance(data, str):
+		if isinstance(data, memoryview):
+			data = data.tobytes()
+		else:
+			data = str(data)
+
+	return _decodePacket(data, 0, len(data))
+
 ######
 #
 # Utility functions
@@ -962,18 +1103,263 @@ def parseUrlStr(url):
 	
 	return ((host, port), prefix)
 
+######
+#
+# Batched datagram I/O
+#
+######
+
+# On Linux, recvmmsg() / sendmmsg() move many datagrams per system-call.
+# They are reached through ctypes; hasBatchIO() tells if they are available.
+try:
+	import ctypes, ctypes.util
+	
+	_libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+	_recvmmsg = _libc.recvmmsg
+	_sendmmsg = _libc.sendmmsg
+	
+	class _iovec(ctypes.Structure):
+		_fields_ = [('iov_base', ctypes.c_void_p), ('iov_len', ctypes.c_size_t)]
+	
+	class _sockaddr_in(ctypes.Structure):
+		_fields_ = [('sin_family', ctypes.c_ushort), ('sin_port', ctypes.c_ushort),
+			('sin_addr', ctypes.c_ubyte * 4), ('sin_zero', ctypes.c_ubyte * 8)]
+	
+	class _msghdr(ctypes.Structure):
+		_fields_ = [('msg_name', ctypes.c_void_p), ('msg_namelen', ctypes.c_uint),
+			('msg_iov', ctypes.POINTER(_iovec)), ('msg_iovlen', ctypes.c_size_t),
+			('msg_control', ctypes.c_void_p), ('msg_controllen', ctypes.c_size_t),
+			('msg_flags', ctypes.c_int)]
+	
+	class _mmsghdr(ctypes.Structure):
+		_fields_ = [('msg_hdr', _msghdr), ('msg_len', ctypes.c_uint)]
+	
+	_recvmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_mmsghdr), ctypes.c_uint, ctypes.c_int, ctypes.c_void_p]
+	_sendmmsg.argtypes = [ctypes.c_int, ctypes.POINTER(_mmsghdr), ctypes.c_uint, ctypes.c_int]
+	
+except (ImportError, OSError, AttributeError, TypeError):
+	_libc = None
+
+_MSG_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', 0x40)
+_MSG_TRUNC = getattr(socket, 'MSG_TRUNC', 0x20)
+
+def hasBatchIO(sock=None):
+	"""Returns True if recvmmsg() / sendmmsg() can be used (on the given socket).
+	Only IPv4 UDP-sockets on Linux are supported.
+	"""
+	if _libc == None or not sys.platform.startswith('linux'):
+		return False
+	
+	if sock != None:
+		return (sock.family == socket.AF_INET) and (sock.type == socket.SOCK_DGRAM)
+	
+	return True
+
+def _socketError():
+	err = ctypes.get_errno()
+	return socket.error(err, os.strerror(err))
+
+class OSCBatchIO(object):
+	"""Base-class for batched datagram I/O on a socket.
+	Holds 'size' preallocated message-headers, and counts the batches it moves.
+	"""
+	def __init__(self, sock, size=32):
+		"""Instantiate an OSCBatchIO.
+		  - sock: an IPv4 UDP-socket. The socket is not closed by this object.
+		  - size (int): the maximum number of datagrams per system-call
+		Raises OSCError if batched I/O is not available for the socket.
+		"""
+		if not hasBatchIO(sock):
+			raise OSCError("recvmmsg() / sendmmsg() not available")
+		
+		if size < 1:
+			raise ValueError("batch size must be at least 1")
+		
+		self.socket = sock
+		self.size = size
+		self.headers = (_mmsghdr * size)()
+		self.iovecs = (_iovec * size)()
+		self.names = (_sockaddr_in * size)()
+		for i in range(size):
+			hdr = self.headers[i].msg_hdr
+			hdr.msg_iov = ctypes.pointer(self.iovecs[i])
+			hdr.msg_iovlen = 1
+			hdr.msg_name = ctypes.addressof(self.names[i])
+			hdr.msg_namelen = ctypes.sizeof(_sockaddr_in)
+		
+		self.calls = 0
+		self.batches = 0
+		self.packets = 0
+		self.max_batch = 0
+	
+	def _count(self, count):
+		self.batches += 1
+		self.packets += count
+		if count > self.max_batch:
+			self.max_batch = count
+	
+	def getStats(self):
+		"""Returns a dict of counters:
+		  - 'size': the maximum number of datagrams per system-call
+		  - 'calls': system-calls made
+		  - 'batches': system-calls that moved at least one datagram
+		  - 'packets': datagrams moved
+		  - 'mean_batch': the mean number of datagrams per batch
+		  - 'max_batch': the largest batch so far
+		"""
+		mean = 0.0
+		if self.batches:
+			mean = float(self.packets) / self.batches
+		
+		return {
+			'size': self.size,
+			'calls': self.calls,
+			'batches': self.batches,
+			'packets': self.packets,
+			'mean_batch': mean,
+			'max_batch': self.max_batch,
+		}
+
+class OSCBatchReceiver(OSCBatchIO):
+	"""Receives up to 'size' datagrams per recvmmsg() call, into preallocated buffers.
+	"""
+	def __init__(self, sock, size=32, buffer_size=8192):
+		"""Instantiate an OSCBatchReceiver.
+		  - sock, size: see OSCBatchIO
+		  - buffer_size (int): the largest datagram received in full; longer ones are
+		  truncated (and counted)
+		"""
+		OSCBatchIO.__init__(self, sock, size)
+		
+		self.buffers = [ctypes.create_string_buffer(buffer_size) for i in range(size)]
+		for i in range(size):
+			self.iovecs[i].iov_base = ctypes.addressof(self.buffers[i])
+			self.iovecs[i].iov_len = buffer_size
+		
+		self.truncated = 0
+	
+	def recv(self):
+		"""Receive the datagrams waiting on the socket, up to 'size' of them, without blocking.
+		Returns a list of (data, (host, port)) tuples; empty if nothing was waiting.
+		"""
+		self.calls += 1
+		count = _recvmmsg(self.socket.fileno(), self.headers, self.size, _MSG_DONTWAIT, None)
+		if count < 0:
+			if ctypes.get_errno() in _wouldBlock + (errno.EINTR,):
+				return []
+			
+			raise _socketError()
+		
+		self._count(count)
+		
+		packets = []
+		namelen = ctypes.sizeof(_sockaddr_in)
+		for i in range(count):
+			header = self.headers[i]
+			hdr = header.msg_hdr
+			if hdr.msg_flags & _MSG_TRUNC:
+				self.truncated += 1
+			
+			name = self.names[i]
+			address = (socket.inet_ntoa(str(bytearray(name.sin_addr))), socket.ntohs(name.sin_port))
+			packets.append((ctypes.string_at(self.buffers[i], header.msg_len), address))
+			
+			# the kernel shortens the name-length to the address it wrote
+			hdr.msg_namelen = namelen
+		
+		return packets
+	
+	def getStats(self):
+		"""Returns a dict of counters; see OSCBatchIO.getStats(), plus
+		  - 'truncated': datagrams longer than the receive-buffers
+		"""
+		stats = OSCBatchIO.getStats(self)
+		stats['truncated'] = self.truncated
+		return stats
+
+class OSCBatchSender(OSCBatchIO):
+	"""Sends up to 'size' datagrams per sendmmsg() call.
+	"""
+	def __init__(self, sock, size=32):
+		"""Instantiate an OSCBatchSender.
+		  - sock, size: see OSCBatchIO
+		"""
+		OSCBatchIO.__init__(self, sock, size)
+		
+		self.hosts = {}
+	
+	def _setName(self, i, address):
+		hdr = self.headers[i].msg_hdr
+		if address == None:
+			hdr.msg_name = None
+			hdr.msg_namelen = 0
+			return
+		
+		(host, port) = address
+		addr = self.hosts.get(host)
+		if addr == None:
+			addr = bytearray(socket.inet_aton(socket.gethostbyname(host)))
+			self.hosts[host] = addr
+		
+		name = self.names[i]
+		name.sin_family = socket.AF_INET
+		name.sin_port = socket.htons(port)
+		name.sin_addr[:] = addr
+		hdr.msg_name = ctypes.addressof(name)
+		hdr.msg_namelen = ctypes.sizeof(_sockaddr_in)
+	
+	def send(self, packets):
+		"""Send the first 'size' (binary, address) tuples of 'packets' in one sendmmsg() call.
+		An address of None sends to the socket's connected address.
+		Returns the number of packets the kernel took, which may be less than were given.
+		Raises socket.error if the kernel took none.
+		"""
+		count = 0
+		for (binary, address) in packets:
+			if count == self.size:
+				break
+			
+			# the iovec points into the string itself; 'packets' keeps it alive
+			self.iovecs[count].iov_base = ctypes.cast(ctypes.c_char_p(binary), ctypes.c_void_p).value
+			self.iovecs[count].iov_len = len(binary)
+			self._setName(count, address)
+			count += 1
+		
+		if not count:
+			return 0
+		
+		self.calls += 1
+		sent = _sendmmsg(self.socket.fileno(), self.headers, count, 0)
+		if sent < 0:
+			raise _socketError()
+		
+		self._count(sent)
+		return sent
+
 ######
 #
 # OSCClient class
 #
 ######
 
+# socket-errors meaning 'the kernel can't take this packet right now'
+_wouldBlock = (errno.EAGAIN, errno.EWOULDBLOCK, errno.ENOBUFS)
+
 class OSCClient(object):
 	"""Simple OSC Client. Handles the sending of OSC-Packets (OSCMessage or OSCBundle) via a UDP-socket
+
+	The Client's socket is non-blocking. Packets are written straight to the socket,
+	without first waiting for it to become writable. Only when the kernel refuses a
+	packet (EAGAIN) is it queued in the Client's outbox, and the Client waits for the
+	socket before sending it. Later packets are queued behind it, so packets are
+	always sent in order.
 	"""
 	# set outgoing socket buffer size
 	sndbuf_size = 4096 * 8
 
+	# maximum number of packets queued while the socket is not writable
+	outbox_size = 1024
+
 	def __init__(self, server=None):
 		"""Construct an OSC Client.
 		When the 'address' argument is given this client is connected to a specific remote server.
@@ -985,11 +1371,16 @@ class OSCClient(object):
 		  If none is supplied, a socket will be created.
 		"""
 		self.socket = None
+		self.outbox = deque()
+		self.sent = 0
+		self.eagain = 0
+		self.dropped = 0
+		self._lock = threading.Lock()
+		self.batch_size = 0
+		self.sender = None
 		
 		if server == None:
-			self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-			self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf_size)
-			self._fd = self.socket.fileno()
+			self.setSocket(socket.socket(socket.AF_INET, socket.SOCK_DGRAM))
 
 			self.server = None
 		else:
@@ -997,6 +1388,28 @@ class OSCClient(object):
 
 		self.client_address = None
 		
+	def setSocket(self, sock):
+		"""Use the given UDP-socket for transmissions.
+		The socket is made non-blocking.
+		"""
+		self.socket = sock
+		self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf_size)
+		self.socket.settimeout(0.0)
+		self._fd = self.socket.fileno()
+		self.setBatchSize(self.batch_size)
+
+	def setBatchSize(self, size):
+		"""Send queued packets up to 'size' at a time, with sendmmsg().
+		A size of 0 or 1 sends one packet per system-call.
+		Returns True if batching is used; it is not where sendmmsg() isn't available.
+		"""
+		self.batch_size = size
+		self.sender = None
+		if (size > 1) and (self.socket != None) and hasBatchIO(self.socket):
+			self.sender = OSCBatchSender(self.socket, size)
+		
+		return self.sender != None
+
 	def setServer(self, server):
 		"""Associate this Client with given server.
 		The Client will send from the Server's socket.
@@ -1008,9 +1421,9 @@ class OSCClient(object):
 		if self.socket != None:
 			self.close()
 
-		self.socket = server.socket.dup()
-		self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf_size)
-		self._fd = self.socket.fileno()
+		# a descriptor of our own on the Server's socket, so setting it
+		# non-blocking doesn't change the Server's timeout
+		self.setSocket(socket.fromfd(server.socket.fileno(), server.socket.family, server.socket.type))
 
 		self.server = server
 
@@ -1086,27 +1499,16 @@ class OSCClient(object):
 		"""Send the given OSCMessage to the specified address.
 		  - msg:  OSCMessage (or OSCBundle) to be sent
 		  - address:  (host, port) tuple specifing remote server to send the message to
-		  - timeout:  A timeout value for attempting to send. If timeout == None,
-		  	this call blocks until socket is available for writing. 
-		Raises OSCClientError when timing out while waiting for the socket. 
+		  - timeout:  A timeout value for waiting on the socket when the kernel can't
+		  	take the message right away. If timeout == None, this call then blocks until
+		  	the socket is available for writing. On timeout, the message stays queued.
+		Raises OSCClientError when the Client's send-queue is full.
 		"""
 		if not isinstance(msg, OSCMessage):
 			raise TypeError("'msg' argument is not an OSCMessage or OSCBundle object")
 
-		ret = select.select([],[self._fd], [], timeout)
-		try:
-			ret[1].index(self._fd)
-		except:
-			# for the very rare case this might happen
-			raise OSCClientError("Timed out waiting for file descriptor")
-		
 		try:
-			self.socket.connect(address)
-			self.socket.sendall(msg.getBinary())
-			
-			if self.client_address:
-				self.socket.connect(self.client_address)
-			
+			self._transmit(msg.getBinary(), address, timeout)
 		except socket.error, e:
 			if e[0] in (7, 65):	# 7 = 'no address associated with nodename',  65 = 'no route to host'
 				raise e
@@ -1117,29 +1519,187 @@ class OSCClient(object):
 		"""Send the given OSCMessage.
 		The Client must be already connected.
 		  - msg:  OSCMessage (or OSCBundle) to be sent
-		  - timeout:  A timeout value for attempting to send. If timeout == None,
-		  	this call blocks until socket is available for writing. 
-		Raises OSCClientError when timing out while waiting for the socket,
+		  - timeout:  A timeout value for waiting on the socket when the kernel can't
+		  	take the message right away. If timeout == None, this call then blocks until
+		  	the socket is available for writing. On timeout, the message stays queued.
+		Raises OSCClientError when the Client's send-queue is full,
 		or when the Client isn't connected to a remote server.
 		"""
 		if not isinstance(msg, OSCMessage):
 			raise TypeError("'msg' argument is not an OSCMessage or OSCBundle object")
 
-		ret = select.select([],[self._fd], [], timeout)
-		try:
-			ret[1].index(self._fd)
-		except:
-			# for the very rare case this might happen
-			raise OSCClientError("Timed out waiting for file descriptor")
-		
+		self.sendRaw(msg.getBinary(), timeout)
+
+	def sendRaw(self, binary, timeout=None):
+		"""Send an already encoded OSC-packet (see OSCMessageTemplate).
+		The Client must be already connected.
+		  - binary:  the binary representation of an OSCMessage or OSCBundle
+		  - timeout:  A timeout value for waiting on the socket when the kernel can't
+		  	take the message right away. If timeout == None, this call then blocks until
+		  	the socket is available for writing. On timeout, the message stays queued.
+		Raises OSCClientError when the Client's send-queue is full,
+		or when the Client isn't connected to a remote server.
+		"""
 		try:
-			self.socket.sendall(msg.getBinary())
+			self._transmit(binary, None, timeout)
 		except socket.error, e:
 			if e[0] in (7, 65):	# 7 = 'no address associated with nodename',  65 = 'no route to host'
 				raise e
 			else:
 				raise OSCClientError("while sending: %s" % str(e))
 
+	def _sendPacket(self, binary, address):
+		"""Write one packet to the socket; to 'address', or to the connected
+		remote server if 'address' is None.
+		"""
+		if address == None:
+			self.socket.send(binary)
+			return
+
+		try:
+			self.socket.sendto(binary, address)
+		except socket.error, e:
+			if e[0] != errno.EISCONN:
+				raise
+
+			# BSD won't sendto() another address on a connected socket
+			self.socket.connect(address)
+			try:
+				self.socket.send(binary)
+			finally:
+				if self.client_address:
+					self.socket.connect(self.client_address)
+
+	def _transmit(self, binary, address, timeout):
+		"""Send the packet right away if nothing is queued and the kernel takes it.
+		Otherwise queue it, and flush() the queue.
+		"""
+		self._lock.acquire()
+		try:
+			if not len(self.outbox):
+				try:
+					self._sendPacket(binary, address)
+					self.sent += 1
+					return
+				except socket.error, e:
+					if e[0] not in _wouldBlock:
+						raise
+
+					self.eagain += 1
+
+			if len(self.outbox) >= self.outbox_size:
+				self.dropped += 1
+				raise OSCClientError("Send-queue full (%d packets)" % len(self.outbox))
+
+			self.outbox.append((binary, address))
+			self._flush(timeout)
+		finally:
+			self._lock.release()
+
+	def _flush(self, timeout):
+		"""Send queued packets in order, waiting up to 'timeout' seconds for the socket
+		each time the kernel refuses one. Returns the number of packets still queued.
+		With a batch-size set, several queued packets go out per system-call.
+		"""
+		outbox = self.outbox
+		while len(outbox):
+			try:
+				if (self.sender != None) and (len(outbox) > 1):
+					count = self.sender.send(outbox)
+				else:
+					(binary, address) = outbox[0]
+					self._sendPacket(binary, address)
+					count = 1
+			except socket.error, e:
+				if e[0] not in _wouldBlock:
+					outbox.popleft()
+					raise
+
+				self.eagain += 1
+				if timeout == 0:
+					break
+
+				ret = select.select([],[self._fd], [], timeout)
+				if not len(ret[1]):
+					break
+
+				continue
+
+			for i in xrange(count):
+				outbox.popleft()
+			
+			self.sent += count
+
+		return len(outbox)
+
+	def flush(self, timeout=None):
+		"""Send any packets queued while the socket was not writable.
+		  - timeout:  A timeout value for waiting on the socket. If timeout == None,
+		  	this call blocks until the queue is empty.
+		Returns the number of packets still queued.
+		"""
+		self._lock.acquire()
+		try:
+			return self._flush(timeout)
+		except socket.error, e:
+			raise OSCClientError("while flushing: %s" % str(e))
+		finally:
+			self._lock.release()
+
+	def sendRawMany(self, binaries, timeout=None):
+		"""Send several already encoded OSC-packets, in order.
+		With a batch-size set (see setBatchSize()) they go out in as few system-calls as possible.
+		The Client must be already connected.
+		  - binaries:  a list of binary OSCMessages or OSCBundles
+		  - timeout:  see sendRaw()
+		Raises OSCClientError when the Client's send-queue overflows; the packets that fit are still sent.
+		"""
+		self._lock.acquire()
+		try:
+			dropped = 0
+			for binary in binaries:
+				if (len(self.outbox) >= self.outbox_size) and self._flush(timeout) >= self.outbox_size:
+					dropped += 1
+					continue
+				
+				self.outbox.append((binary, None))
+			
+			self._flush(timeout)
+		except socket.error, e:
+			raise OSCClientError("while sending: %s" % str(e))
+		finally:
+			self._lock.release()
+		
+		if dropped:
+			self.dropped += dropped
+			raise OSCClientError("Send-queue full, %d packets dropped" % dropped)
+
+	def sendQueueDepth(self):
+		"""Returns the number of packets waiting for the socket to become writable
+		"""
+		return len(self.outbox)
+
+	def getStats(self):
+		"""Returns a dict of counters:
+		  - 'sent': packets written to the socket
+		  - 'send_queue_depth': packets waiting for the socket to become writable
+		  - 'eagain': times the kernel refused a packet (EAGAIN / ENOBUFS)
+		  - 'dropped': packets refused because the send-queue was full
+		  - 'send_batch': the sendmmsg() batch-sizes (see OSCBatchIO.getStats()),
+		  or None if packets are sent one at a time
+		"""
+		send_batch = None
+		if self.sender != None:
+			send_batch = self.sender.getStats()
+		
+		return {
+			'sent': self.sent,
+			'send_queue_depth': len(self.outbox),
+			'eagain': self.eagain,
+			'dropped': self.dropped,
+			'send_batch': send_batch,
+		}
+
 ######
 #
 # FilterString Utility functions
@@ -1231,6 +1791,143 @@ def getRegEx(pattern):
 	
 	return re.compile(pattern)
 	
+######
+#
+# OSCAddressTree class
+#
+######
+
+class OSCAddressTree(object):
+	"""Index of the OSC-addresses registered with an OSCServer, for matching
+	received address-patterns without scanning every registered address.
+
+	Registered addresses are stored in a set, and in a tree with one level per
+	'/'-separated segment.
+	 - A pattern without wildcards is a single set lookup; its cost does not depend
+	 on the number of registered addresses.
+	 - For a pattern with wildcards, the tree is followed for as long as the pattern's
+	 segments are literal. Only the addresses below that point are matched against
+	 the pattern's regular expression (see getRegEx()), so '*' keeps its usual
+	 meaning of 'any characters, including /'.
+	Wildcard match results are cached per pattern until the address-space changes.
+	"""
+	# characters that turn an OSC-address into an address-pattern
+	wildcards = "*?,[]{}"
+
+	# maximum number of cached wildcard pattern-matches
+	cache_size = 4096
+
+	def __init__(self):
+		"""Instantiate an empty OSCAddressTree
+		"""
+		self.root = {}
+		self.addresses = set()
+		self.cache = {}
+		self.lock = threading.Lock()
+
+	def _isPattern(self, segment):
+		"""Returns True if the given address-segment contains any wildcards
+		"""
+		for chk in self.wildcards:
+			if chk in segment:
+				return True
+
+		return False
+
+	def add(self, address):
+		"""Add the given OSC-address to the tree
+		"""
+		self.lock.acquire()
+		try:
+			node = self.root
+			for segment in address.split('/')[1:]:
+				node = node.setdefault(segment, {})
+
+			node[None] = address
+			self.addresses.add(address)
+			self.cache = {}
+		finally:
+			self.lock.release()
+
+	def remove(self, address):
+		"""Remove the given OSC-address from the tree. Emptied branches are pruned
+		"""
+		self.lock.acquire()
+		try:
+			self.addresses.discard(address)
+			path = [self.root]
+			for segment in address.split('/')[1:]:
+				node = path[-1].get(segment)
+				if node is None:
+					return
+
+				path.append(node)
+
+			path[-1].pop(None, None)
+			segments = address.split('/')[1:]
+			while (len(path) > 1) and not len(path[-1]):
+				path.pop()
+				del path[-1][segments[len(path) - 1]]
+
+			self.cache = {}
+		finally:
+			self.lock.release()
+
+	def _collect(self, node, out):
+		"""Appends all addresses stored at or below the given node to 'out'
+		"""
+		for (segment, child) in node.items():
+			if segment is None:
+				out.append(child)
+			else:
+				self._collect(child, out)
+
+	def match(self, pattern):
+		"""Returns a tuple of all registered OSC-addresses matching the given address-pattern
+		"""
+		if not self._isPattern(pattern):
+			if pattern in self.addresses:
+				return (pattern,)
+
+			return ()
+
+		cache = self.cache
+		matched = cache.get(pattern)
+		if matched is not None:
+			return matched
+
+		# follow the tree along the pattern's literal leading segments
+		node = self.root
+		segments = pattern.split('/')
+		if not len(segments[0]):
+			for segment in segments[1:]:
+				if self._isPattern(segment):
+					break
+
+				node = node.get(segment)
+				if node is None:
+					break
+
+		if node is None:
+			matched = ()
+		else:
+			candidates = []
+			self._collect(node, candidates)
+			expr = getRegEx(pattern)
+			out = []
+			for addr in candidates:
+				match = expr.match(addr)
+				if match and (match.end() == len(addr)):
+					out.append(addr)
+
+			matched = tuple(out)
+
+		if len(cache) >= self.cache_size:
+			cache.clear()
+
+		cache[pattern] = matched
+		return matched
+
 ######
 #
 # OSCMultiClient class
@@ -1580,26 +2277,198 @@ class OSCMultiClient(OSCClient):
 			if len(prefix):
 				out = self._prefixAddress(prefix, msg)
 
-			binary = out.getBinary()
-			
-			ret = select.select([],[self._fd], [], timeout)
 			try:
-				ret[1].index(self._fd)
-			except:
-				# for the very rare case this might happen
-				raise OSCClientError("Timed out waiting for file descriptor")
-			
-			try:
-				while len(binary):
-					sent = self.socket.sendto(binary, address)
-					binary = binary[sent:]
-				
+				self._transmit(out.getBinary(), address, timeout)
 			except socket.error, e:
 				if e[0] in (7, 65):	# 7 = 'no address associated with nodename',  65 = 'no route to host'
 					raise e
 				else:
 					raise OSCClientError("while sending to %s: %s" % (str(address), str(e)))
 
+######
+#
+# OSCScheduler class
+#
+######
+
+class OSCScheduler(threading.Thread):
+	"""A single timer thread that runs callbacks at given times.
+	Scheduled calls are kept in a min-heap keyed by their time, so the thread only
+	ever waits for the earliest one. Used by the OSCServer for future-dated bundles,
+	instead of parking a handler thread in time.sleep() per bundle, and usable for
+	any other timed call (e.g. timed sends).
+	The thread sleeps in select() on a pipe, which schedule() and stop() write to:
+	on Python 2 a timed Condition.wait() polls in steps of up to 50 ms, so a call
+	scheduled before the earliest one would only be seen at the next poll.
+	"""
+	def __init__(self):
+		"""Instantiate an OSCScheduler. The thread starts with the first scheduled call.
+		"""
+		threading.Thread.__init__(self)
+		self.daemon = True
+		
+		self.heap = []
+		self.sequence = 0
+		self.lock = threading.Lock()
+		self.running = False
+		self.stopped = False
+		
+		# self-pipe; 'woken' is set while a byte is waiting in it, so it never fills up
+		(self.wake_in, self.wake_out) = os.pipe()
+		self.woken = False
+		
+		self.scheduled = 0
+		self.dispatched = 0
+		self.cancelled = 0
+		self.errors = 0
+		self.total_lateness = 0.0
+		self.max_lateness = 0.0
+	
+	def _wake(self):
+		"""Wake the scheduler thread. Call with self.lock held.
+		"""
+		if not self.woken:
+			self.woken = True
+			os.write(self.wake_out, "\0")
+	
+	def schedule(self, when, callback, *args):
+		"""Call callback(*args) from the scheduler thread at time 'when'
+		(seconds since the epoch, like OSC timetags).
+		Returns a handle for cancel().
+		Raises OSCError if the scheduler was stopped.
+		"""
+		with self.lock:
+			if self.stopped:
+				raise OSCError("OSCScheduler is stopped")
+			
+			if not self.running and not self.isAlive():
+				self.running = True
+				self.start()
+			
+			self.sequence += 1
+			entry = [when, self.sequence, callback, args]
+			heapq.heappush(self.heap, entry)
+			self.scheduled += 1
+			if self.heap[0] is entry:
+				self._wake()
+			
+		return entry
+	
+	def cancel(self, handle):
+		"""Cancel a scheduled call. Returns False if it already ran or was cancelled.
+		"""
+		with self.lock:
+			if handle[2] is None:
+				return False
+			
+			handle[2] = None
+			handle[3] = None
+			self.cancelled += 1
+			return True
+	
+	def run(self):
+		"""Run due calls until stopped
+		"""
+		heap = self.heap
+		try:
+			while True:
+				entry = None
+				with self.lock:
+					if not self.running:
+						return
+					
+					if heap:
+						delay = heap[0][0] - time.time()
+						if delay <= 0:
+							entry = heapq.heappop(heap)
+							(when, sequence, callback, args) = entry
+							if callback is None:		# cancelled
+								continue
+							
+							# mark it as run, so cancel() reports it can't be cancelled
+							entry[2] = None
+							entry[3] = None
+					else:
+						delay = None
+				
+				if entry is None:
+					try:
+						ready = select.select([self.wake_in], [], [], delay)[0]
+					except select.error, e:
+						if e[0] != errno.EINTR:
+							raise
+						
+						continue
+					
+					if ready:
+						# clear the flag before looking at the heap again, so no wake-up is lost
+						with self.lock:
+							os.read(self.wake_in, 1)
+							self.woken = False
+					
+					continue
+				
+				lateness = time.time() - when
+				self.total_lateness += lateness
+				if lateness > self.max_lateness:
+					self.max_lateness = lateness
+				
+				self.dispatched += 1
+				try:
+					callback(*args)
+				except Exception:
+					self.errors += 1
+		finally:
+			self._closePipe()
+	
+	def _closePipe(self):
+		os.close(self.wake_in)
+		os.close(self.wake_out)
+	
+	def stop(self):
+		"""Stop the scheduler thread. Calls that have not run yet are discarded.
+		A stopped scheduler can't be restarted.
+		"""
+		with self.lock:
+			if self.stopped:
+				return
+			
+			started = self.running
+			self.running = False
+			self.stopped = True
+			if started:
+				self._wake()
+			else:
+				self._closePipe()
+	
+	def pending(self):
+		"""Returns the number of scheduled calls that have not run yet
+		"""
+		with self.lock:
+			return len([entry for entry in self.heap if entry[2] is not None])
+	
+	def getStats(self):
+		"""Returns a dict of counters:
+		  - 'scheduled', 'dispatched', 'cancelled': numbers of calls
+		  - 'errors': calls that raised an exception
+		  - 'pending': calls waiting to run
+		  - 'mean_lateness', 'max_lateness': seconds between a call's time and when it ran
+		"""
+		if self.dispatched:
+			mean = self.total_lateness / self.dispatched
+		else:
+			mean = 0.0
+		
+		return {
+			'scheduled': self.scheduled,
+			'dispatched': self.dispatched,
+			'cancelled': self.cancelled,
+			'errors': self.errors,
+			'pending': self.pending(),
+			'mean_lateness': mean,
+			'max_lateness': self.max_lateness,
+		}
+
 ######
 #
 # OSCRequestHandler classes
@@ -1611,7 +2480,7 @@ class OSCRequestHandler(DatagramRequestHandler):
 	"""
 	def dispatchMessage(self, pattern, tags, data):
 		"""Attmept to match the given OSC-address pattern, which may contain '*',
-		against all callbacks registered with the OSCServer.
+		against all callbacks registered with the OSCServer (see OSCAddressTree).
 		Calls the matching callback and returns whatever it returns.
 		If no match is found, and a 'default' callback is registered, it calls that one,
 		or raises NoCallbackError if a 'default' callback is not registered.
@@ -1623,19 +2492,20 @@ class OSCRequestHandler(DatagramRequestHandler):
 		if len(tags) != len(data):
 			raise OSCServerError("Malformed OSC-message; got %d typetags [%s] vs. %d values" % (len(tags), tags, len(data)))
 		
-		expr = getRegEx(pattern)
-		
 		replies = []
 		matched = 0
-		for addr in self.server.callbacks.keys():
-			match = expr.match(addr)
-			if match and (match.end() == len(addr)):
-				reply = self.server.callbacks[addr](pattern, tags, data, self.client_address)
-				matched += 1
-				if isinstance(reply, OSCMessage):
-					replies.append(reply)
-				elif reply != None:
-					raise TypeError("Message-callback %s did not return OSCMessage or None: %s" % (self.server.callbacks[addr], type(reply)))
+		callbacks = self.server.callbacks
+		for addr in self.server.addressTree.match(pattern):
+			callback = callbacks.get(addr)
+			if callback is None:
+				continue
+			
+			reply = callback(pattern, tags, data, self.client_address)
+			matched += 1
+			if isinstance(reply, OSCMessage):
+				replies.append(reply)
+			elif reply != None:
+				raise TypeError("Message-callback %s did not return OSCMessage or None: %s" % (callback, type(reply)))
 					
 		if matched == 0:
 			if 'default' in self.server.callbacks:
@@ -1657,19 +2527,33 @@ class OSCRequestHandler(DatagramRequestHandler):
 		(self.packet, self.socket) = self.request
 		self.replies = []
 
-	def _unbundle(self, decoded):
-		"""Recursive bundle-unpacking function"""
+	def _unbundle(self, decoded, replies):
+		"""Recursive bundle-unpacking function.
+		Replies are added to the given list.
+		"""
 		if decoded[0] != "#bundle":
-			self.replies += self.dispatchMessage(decoded[0], decoded[1][1:], decoded[2:])
+			replies.extend(self.dispatchMessage(decoded[0], decoded[1][1:], decoded[2:]))
 			return
 		
-		now = time.time()
 		timetag = decoded[1]
-		if (timetag > 0.) and (timetag > now):
-			time.sleep(timetag - now)
+		if (timetag > 0.) and (timetag > time.time()):
+			if self.server.schedule_bundles:
+				self.server.getScheduler().schedule(timetag, self._dispatchScheduled, decoded)
+				return
+			
+			time.sleep(max(timetag - time.time(), 0.))
 		
 		for msg in decoded[2:]:
-			self._unbundle(msg)
+			self._unbundle(msg, replies)
+	
+	def _dispatchScheduled(self, decoded):
+		"""Dispatch a future-dated bundle from the server's scheduler, when it is due,
+		and send its replies. The request's own handling may still be running, so the
+		bundle's replies are kept apart from self.replies.
+		"""
+		replies = []
+		self._unbundle(decoded, replies)
+		self._sendReplies(replies)
 		
 	def handle(self):
 		"""Handle incoming OSCMessage
@@ -1678,50 +2562,59 @@ class OSCRequestHandler(DatagramRequestHandler):
 		if not len(decoded):
 			return
 		
-		self._unbundle(decoded)
+		self._unbundle(decoded, self.replies)
 		
 	def finish(self):
 		"""Finish handling OSCMessage.
 		Send any reply returned by the callback(s) back to the originating client
 		as an OSCMessage or OSCBundle
 		"""
+		self._sendReplies(self.replies)
+	
+	def _sendReplies(self, replies):
+		"""Send the given replies back to the originating client,
+		as an OSCMessage or OSCBundle
+		"""
+		address = self.client_address
 		if self.server.return_port:
-			self.client_address = (self.client_address[0], self.server.return_port)
+			address = (address[0], self.server.return_port)
 		
-		if len(self.replies) > 1:
+		if len(replies) > 1:
 			msg = OSCBundle()
-			for reply in self.replies:
+			for reply in replies:
 				msg.append(reply)
-		elif len(self.replies) == 1:
-			msg = self.replies[0]
+		elif len(replies) == 1:
+			msg = replies[0]
 		else:
 			return
 		
-		self.server.client.sendto(msg, self.client_address)
+		self.server.client.sendto(msg, address)
 
 class ThreadingOSCRequestHandler(OSCRequestHandler):
 	"""Multi-threaded OSCRequestHandler;
 	Starts a new RequestHandler thread for each unbundled OSCMessage
 	"""
-	def _unbundle(self, decoded):
+	def _unbundle(self, decoded, replies):
 		"""Recursive bundle-unpacking function
 		This version starts a new thread for each sub-Bundle found in the Bundle,
 		then waits for all its children to finish.
 		"""
 		if decoded[0] != "#bundle":
-			self.replies += self.dispatchMessage(decoded[0], decoded[1][1:], decoded[2:])
+			replies.extend(self.dispatchMessage(decoded[0], decoded[1][1:], decoded[2:]))
 			return
 		
-		now = time.time()
 		timetag = decoded[1]
-		if (timetag > 0.) and (timetag > now):
-			time.sleep(timetag - now)
-			now = time.time()
+		if (timetag > 0.) and (timetag > time.time()):
+			if self.server.schedule_bundles:
+				self.server.getScheduler().schedule(timetag, self._dispatchScheduled, decoded)
+				return
+			
+			time.sleep(max(timetag - time.time(), 0.))
 			
 		children = []
 		
 		for msg in decoded[2:]:
-			t = threading.Thread(target = self._unbundle, args = (msg,))
+			t = threading.Thread(target = self._unbundle, args = (msg, replies))
 			t.start()
 			children.append(t)
 			
@@ -1753,6 +2646,9 @@ class OSCServer(UDPServer):
 	# DEBUG: print error-tracebacks (to stderr)?
 	print_tracebacks = False
 	
+	# dispatch future-dated bundles from the scheduler thread (see getScheduler)
+	schedule_bundles = True
+	
 	def __init__(self, server_address, client=None, return_port=0):
 		"""Instantiate an OSCServer.
 		  - server_address ((host, port) tuple): the local host & UDP-port
@@ -1765,6 +2661,7 @@ class OSCServer(UDPServer):
 		UDPServer.__init__(self, server_address, self.RequestHandlerClass)
 		
 		self.callbacks = {}
+		self.addressTree = OSCAddressTree()
 		self.setReturnPort(return_port)
 		self.error_prefix = ""
 		self.info_prefix = "/info"
@@ -1772,7 +2669,10 @@ class OSCServer(UDPServer):
 		self.socket.settimeout(self.socket_timeout)
 		
 		self.running = False
+		self.closed = False
 		self.client = None
+		self.scheduler = None
+		self.scheduler_lock = threading.Lock()
 		
 		if client == None:
 			self.client = OSCClient(server=self)
@@ -1794,9 +2694,7 @@ class OSCServer(UDPServer):
 		client.close()				# shut-down that socket
 		
 		# force our socket upon the client
-		client.socket = self.socket.dup()
-		client.socket.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, client.sndbuf_size)
-		client._fd = client.socket.fileno()
+		client.setSocket(socket.fromfd(self.socket.fileno(), self.socket.family, self.socket.type))
 		client.server = self
 		
 		if client_address:
@@ -1819,9 +2717,27 @@ class OSCServer(UDPServer):
 		"""Stops serving requests, closes server (socket), closes used client
 		"""
 		self.running = False
+		with self.scheduler_lock:
+			self.closed = True
+			if self.scheduler != None:
+				self.scheduler.stop()
 		self.client.close()
 		self.server_close()
 	
+	def getScheduler(self):
+		"""Returns this server's OSCScheduler, which dispatches future-dated bundles.
+		It is created on first use, and replaced if it was stopped.
+		Raises OSCServerError once the server is closed.
+		"""
+		with self.scheduler_lock:
+			if self.closed:
+				raise OSCServerError("Server is closed, can't schedule")
+			
+			if (self.scheduler == None) or self.scheduler.stopped:
+				self.scheduler = OSCScheduler()
+			
+			return self.scheduler
+	
 	def __str__(self):
 		"""Returns a string containing this Server's Class-name, software-version and local bound address (if any)
 		"""
@@ -1901,6 +2817,7 @@ class OSCServer(UDPServer):
 		
 		if address != 'default':
 			address = '/' + address.strip('/')
+			self.addressTree.add(address)
 			
 		self.callbacks[address] = callback
 		
@@ -1908,6 +2825,8 @@ class OSCServer(UDPServer):
 		"""Remove the registered handler for the given OSC-address
 		"""
 		del self.callbacks[address]
+		if address != 'default':
+			self.addressTree.remove(address)
 	
 	def getOSCAddressSpace(self):
 		"""Returns a list containing all OSC-addresses registerd with this Server. 
@@ -2266,6 +3185,9 @@ class ForkingOSCServer(ForkingMixIn, OSCServer):
 	""" 
 	# set the RequestHandlerClass, will be overridden by ForkingOSCServer & ThreadingOSCServer
 	RequestHandlerClass = ThreadingOSCRequestHandler
+	
+	# a request's process exits once it's handled, so it has to wait for its bundles
+	schedule_bundles = False
 
 class ThreadingOSCServer(ThreadingMixIn, OSCServer):
 	"""An Asynchronous OSCServer.
@@ -2274,6 +3196,184 @@ class ThreadingOSCServer(ThreadingMixIn, OSCServer):
 	# set the RequestHandlerClass, will be overridden by ForkingOSCServer & ThreadingOSCServer
 	RequestHandlerClass = ThreadingOSCRequestHandler
 
+class PooledOSCServer(OSCServer):
+	"""An Asynchronous OSCServer with a fixed pool of worker threads.
+	Instead of starting a new thread for each incoming request, received packets are
+	queued to one of 'workers' long-running threads.
+	The worker is picked by the packet's OSC-address, so packets sent to the same
+	address are always handled one at a time, in the order they arrived.
+	A bundle is picked by its first message's address; so its other messages are only
+	ordered with respect to packets for that first address.
+	Each worker's queue holds at most 'queue_size' packets. Packets arriving at
+	a full queue are dropped, and counted (see getStats()).
+	On Linux, the server can read up to 'batch' packets per recvmmsg() call, which
+	takes far fewer system-calls for bursts of meter-data and pushed updates.
+	"""
+	# bundles are unpacked by the worker itself; no thread per bundle-element
+	RequestHandlerClass = OSCRequestHandler
+
+	def __init__(self, server_address, client=None, return_port=0, workers=4, queue_size=256, batch=0):
+		"""Instantiate a PooledOSCServer.
+		  - server_address, client, return_port: see OSCServer
+		  - workers (int): the number of worker threads handling requests
+		  - queue_size (int): the maximum number of packets waiting for each worker
+		  - batch (int): the maximum number of packets per recvmmsg() call. With 0 or 1,
+		  or where recvmmsg() isn't available, packets are read one at a time.
+		"""
+		OSCServer.__init__(self, server_address, client, return_port)
+
+		self.receiver = None
+		self.recv_errors = 0
+		if (batch > 1) and hasBatchIO(self.socket):
+			self.receiver = OSCBatchReceiver(self.socket, batch, self.max_packet_size)
+
+		self.dropped = 0
+		self.max_queue_depth = 0
+		self.queues = []
+		self.handled = []
+		self.workers = []
+		for i in range(workers):
+			queue = Queue.Queue(queue_size)
+			self.queues.append(queue)
+			self.handled.append(0)
+
+			t = threading.Thread(target=self._work, args=(i,))
+			t.setDaemon(True)
+			t.start()
+			self.workers.append(t)
+
+	def _packetAddress(self, packet):
+		"""Returns the OSC-address a packet is queued by: a message's own address,
+		or the address of a bundle's first message (looking into nested bundles)
+		"""
+		# '#bundle\0', 8-byte timetag, int32 element-size, first element
+		while packet.startswith("#bundle\0") and len(packet) >= 24:
+			size = struct.unpack(">i", packet[16:20])[0]
+			packet = packet[20:20 + size]
+		
+		return packet[:packet.find("\0")]
+
+	def process_request(self, request, client_address):
+		"""Queue the request to the worker handling its OSC-address
+		"""
+		queue = self.queues[hash(self._packetAddress(request[0])) % len(self.queues)]
+		try:
+			queue.put_nowait((request, client_address))
+		except Queue.Full:
+			self.dropped += 1
+			return
+
+		depth = queue.qsize()
+		if depth > self.max_queue_depth:
+			self.max_queue_depth = depth
+
+	def serve_forever(self):
+		"""Handle requests until server is closed, reading them in batches if possible.
+		"""
+		if self.receiver == None:
+			return OSCServer.serve_forever(self)
+
+		self.running = True
+		while self.running:
+			try:
+				ready = select.select([self], [], [], self.socket_timeout)[0]
+				if not ready:
+					continue
+				
+				packets = self.receiver.recv()
+			except (select.error, socket.error), e:
+				if not self.running:		# closed while waiting
+					return
+				
+				# e.g. ECONNREFUSED after an ICMP port-unreachable; like SocketServer's
+				# unbatched get_request(), keep serving
+				if e[0] != errno.EINTR:
+					self.recv_errors += 1
+				
+				continue
+			
+			for (data, client_address) in packets:
+				self.process_request((data, self.socket), client_address)
+
+	def _work(self, index):
+		"""Worker-thread main loop; handles the requests queued for this worker
+		until a 'None' request is received.
+		"""
+		queue = self.queues[index]
+		while True:
+			# no timeout: on Python 2 a timed get() polls, delaying packets by up to 50 ms
+			item = queue.get()
+			if item is None:
+				break
+
+			(request, client_address) = item
+			try:
+				self.finish_request(request, client_address)
+			except:
+				self.handle_error(request, client_address)
+
+			self.shutdown_request(request)
+			self.handled[index] += 1
+
+	def close(self):
+		"""Stops serving requests, closes server (socket), closes used client,
+		and stops the worker threads once they have handled their queued requests.
+		"""
+		OSCServer.close(self)
+		for queue in self.queues:
+			# never block, but always deliver the stop sentinel: a full queue
+			# makes room for it by dropping its oldest packets
+			while True:
+				try:
+					queue.put_nowait(None)
+					break
+				except Queue.Full:
+					pass
+				
+				try:
+					queue.get_nowait()
+					self.dropped += 1
+				except Queue.Empty:
+					pass
+
+		for t in self.workers:
+			if t is not threading.currentThread():
+				t.join(self.socket_timeout)
+
+	def queueDepth(self):
+		"""Returns the number of received packets waiting to be handled
+		"""
+		depth = 0
+		for queue in self.queues:
+			depth += queue.qsize()
+
+		return depth
+
+	def getStats(self):
+		"""Returns a dict of counters:
+		  - 'workers': the number of worker threads
+		  - 'queue_depth': packets currently waiting to be handled
+		  - 'max_queue_depth': the deepest any single worker's queue has been
+		  - 'handled': packets handled so far
+		  - 'dropped': packets dropped because their worker's queue was full
+		  - 'recv_batch': the recvmmsg() batch-sizes (see OSCBatchReceiver.getStats()),
+		  or None if packets are read one at a time
+		  - 'recv_errors': socket-errors while reading batches (e.g. connection refused)
+		"""
+		recv_batch = None
+		if self.receiver != None:
+			recv_batch = self.receiver.getStats()
+		
+		return {
+			'workers': len(self.workers),
+			'queue_depth': self.queueDepth(),
+			'max_queue_depth': self.max_queue_depth,
+			'handled': sum(self.handled),
+			'dropped': self.dropped,
+			'recv_batch': recv_batch,
+			'recv_errors': self.recv_errors,
+		}
+
 ######
 #
 # OSCError classes
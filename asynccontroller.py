@@ -0,0 +1,146 @@
+"""
+asyncio Behringer OSC Mute Automation Controller
+"""
+import trollius as asyncio
+from trollius import From, Return
+import OSC
+import asyncosc
+from controller import MixerCommands, build_elements
+from mixerstate import MixerState
+from x18mixer import MixerElement, SnapElement
+
+
+class AsyncBehringerController(MixerCommands):
+    """
+    BehringerController on an asyncio event loop: one OSCProtocol endpoint
+    instead of a server thread, awaitable get()/set(), and callbacks that
+    may be coroutines.
+    """
+
+    def __init__(self, port=10024, notifier=None, loop=None,
+                 mixer_port=None):
+        self.port = port
+        self.mixer_port = mixer_port or port
+        self.loop = loop or asyncio.get_event_loop()
+        self.notifier = notifier
+        self.endpoint = None
+        self.coalescer = None
+        self.state = MixerState()
+        self.elements = {}
+        self.mixer_name = None
+        self.info = {
+            'model': None,
+            'address': None,
+            'version': None,
+            'name': None}
+
+    def notify(self, m):
+        if self.notifier:
+            self.notifier(m)
+        else:
+            print m
+
+    @asyncio.coroutine
+    def start(self):
+        """
+        Bind the OSC endpoint and set up the mixer elements
+        :return:
+        """
+        self.notify("Starting OSC Connection")
+        self.endpoint = yield From(asyncosc.create_endpoint(
+            ("0.0.0.0", self.port), self.loop))
+        self.notify("Setting up listeners")
+        self.info_call = MixerElement(
+            "/xinfo", self.endpoint, self.endpoint, self.info_callback)
+        self.snapshot_call = SnapElement(
+            "/-snap/load", self.endpoint, self.endpoint)
+        self.elements = build_elements(
+            self.endpoint, self.endpoint, self.state)
+
+    def stop(self):
+        """
+        Stop method
+        """
+        self.notify("Shutting down OSC Connector")
+        self.endpoint.close()
+
+    @asyncio.coroutine
+    def find_mixer(self, address="255.255.255.255", timeout=1.0):
+        """
+        Send /xinfo to the given address (by default, broadcast it) and
+        connect to the first mixer that answers.
+        :param address:
+        :param timeout: seconds to wait for an answer
+        :return: the mixer info
+        """
+        self.endpoint.enable_broadcast()
+        reply = self.endpoint.wait_for("/xinfo", timeout)
+        self.endpoint.sendto(OSC.OSCMessage("/xinfo"),
+                             (address, self.mixer_port))
+        yield From(reply)
+        self.mixer_name = self.info["name"]
+        self.endpoint.connect((self.info['address'], self.mixer_port))
+        raise Return(self.info)
+
+    def info_callback(self, call, param, response, device):
+        """
+        info callback
+        :param call:
+        :param param:
+        :param response:
+        :param device:
+        :return:
+        """
+        self.info['call'] = call
+        self.info['param'] = param
+        self.info['device'] = device
+        self.info['address'] = response[0]
+        self.info['name'] = response[1]
+        self.info['model'] = response[2]
+        self.info['version'] = response[3]
+
+    @asyncio.coroutine
+    def get(self, address, timeout=1.0):
+        """
+        Query a mixer parameter and wait for the answer
+        :param address: OSC address of the element
+        :param timeout: seconds to wait for the answer
+        :return: the element's converted value
+        """
+        element = self.elements[address]
+        reply = self.endpoint.wait_for(address, timeout)
+        element.get()
+        yield From(reply)
+        raise Return(element.value)
+
+    @asyncio.coroutine
+    def set(self, address, value):
+        """
+        Set a mixer parameter
+        :param address: OSC address of the element
+        :param value:
+        :return:
+        """
+        self.elements[address].set(value)
+
+    def add_callback(self, address, callback):
+        """
+        Call callback(call, param, response, device) whenever the mixer
+        reports a new value for the element. The callback may be a coroutine
+        function.
+        :param address: OSC address of the element
+        :param callback:
+        :return:
+        """
+        self.elements[address].callback = callback
+
+    def midi_callback(self, handler):
+        """
+        Wraps a MidiInputHandler for rtmidi's set_callback, so incoming
+        events are parsed on the event loop instead of rtmidi's thread.
+        :param handler:
+        :return:
+        """
+        def callback(event, data=None):
+            self.loop.call_soon_threadsafe(handler.parse_midi, event[0])
+        return callback
@@ -0,0 +1,222 @@
+"""
+asyncio OSC transport.
+
+OSCProtocol is a DatagramProtocol that receives, decodes and dispatches OSC
+packets on the event loop, and sends through the loop's datagram transport.
+It offers the addMsgHandler() of an OSCServer and the send()/sendRaw() of an
+OSCClient, so mixer elements can use one endpoint for both.
+
+On Python 2 this runs on trollius, the asyncio backport.
+"""
+import socket
+import time
+import trollius as asyncio
+from trollius import From, Return
+import OSC
+
+
+class OSCProtocol(asyncio.DatagramProtocol):
+    """
+    OSC endpoint on an asyncio datagram transport.
+    """
+
+    def __init__(self, loop=None):
+        """
+        Initializer
+        :param loop: event loop; defaults to the current event loop
+        :return:
+        """
+        self.loop = loop or asyncio.get_event_loop()
+        self.transport = None
+        self.client_address = None
+        self.callbacks = {}
+        self.addressTree = OSC.OSCAddressTree()
+        self.waiters = {}
+        self.received = 0
+        self.errors = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        self.transport = None
+        for waiters in self.waiters.values():
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.cancel()
+        self.waiters = {}
+
+    def error_received(self, exc):
+        self.errors += 1
+
+    def datagram_received(self, data, addr):
+        """
+        Decode and dispatch one received packet
+        :param data:
+        :param addr:
+        :return:
+        """
+        self.received += 1
+        try:
+            decoded = OSC.decodeOSC(data)
+        except (OSC.OSCError, KeyError, IndexError, ValueError):
+            # a malformed datagram must not escape into the event loop
+            self.errors += 1
+            return
+        if len(decoded):
+            self._unbundle(decoded, addr)
+
+    def _unbundle(self, decoded, addr):
+        """
+        Recursive bundle-unpacking. Future-dated bundles are dispatched
+        from the loop when their timetag comes up.
+        :param decoded:
+        :param addr:
+        :return:
+        """
+        if decoded[0] != "#bundle":
+            self.dispatch(decoded[0], decoded[1][1:], decoded[2:], addr)
+            return
+
+        delay = decoded[1] - time.time()
+        for msg in decoded[2:]:
+            if decoded[1] > 0 and delay > 0:
+                self.loop.call_later(delay, self._unbundle, msg, addr)
+            else:
+                self._unbundle(msg, addr)
+
+    def dispatch(self, pattern, tags, data, addr):
+        """
+        Resolve anyone waiting on the address, then call the matching
+        handlers. Handlers returning a coroutine are scheduled on the loop.
+        :param pattern:
+        :param tags:
+        :param data:
+        :param addr:
+        :return:
+        """
+        waiters = self.waiters.pop(pattern, None)
+        if waiters:
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result(data)
+
+        matched = self.addressTree.match(pattern)
+        if not matched and 'default' in self.callbacks:
+            matched = ('default',)
+
+        for address in matched:
+            callback = self.callbacks.get(address)
+            if callback is None:
+                continue
+            result = callback(pattern, tags, data, addr)
+            if asyncio.iscoroutine(result) or isinstance(result, asyncio.Future):
+                asyncio.ensure_future(result, loop=self.loop)
+
+    def addMsgHandler(self, address, callback):
+        """
+        Register a handler for an OSC-address. The callback is called with
+        (address, tags, data, client_address) and may return a coroutine.
+        :param address:
+        :param callback:
+        :return:
+        """
+        for chk in '*?,[]{}# ':
+            if chk in address:
+                raise OSC.OSCServerError(
+                    "OSC-address string may not contain any characters in '*?,[]{}# '")
+
+        if not callable(callback):
+            raise OSC.OSCServerError(
+                "Message callback '%s' is not callable" % repr(callback))
+
+        if address != 'default':
+            address = '/' + address.strip('/')
+            self.addressTree.add(address)
+
+        self.callbacks[address] = callback
+
+    def delMsgHandler(self, address):
+        """
+        Remove the registered handler for the given OSC-address
+        :param address:
+        :return:
+        """
+        del self.callbacks[address]
+        if address != 'default':
+            self.addressTree.remove(address)
+
+    def wait_for(self, address, timeout=None):
+        """
+        Wait for the next message received on the given address.
+        :param address:
+        :param timeout: seconds, or None to wait forever
+        :return: coroutine resolving to the message arguments
+        """
+        waiter = asyncio.Future(loop=self.loop)
+        self.waiters.setdefault(address, []).append(waiter)
+        return asyncio.wait_for(waiter, timeout, loop=self.loop)
+
+    def connect(self, address):
+        """
+        Set the default (host, port) send() sends to
+        :param address:
+        :return:
+        """
+        self.client_address = address
+
+    def enable_broadcast(self):
+        """
+        Allow sending to broadcast addresses
+        :return:
+        """
+        sock = self.transport.get_extra_info('socket')
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+
+    def send(self, msg, timeout=None):
+        """
+        Send an OSCMessage to the connected address
+        :param msg:
+        :param timeout: unused; datagram sends never block
+        :return:
+        """
+        self.sendRaw(msg.getBinary())
+
+    def sendRaw(self, binary, timeout=None):
+        """
+        Send an encoded packet to the connected address
+        :param binary:
+        :param timeout: unused; datagram sends never block
+        :return:
+        """
+        if self.client_address is None:
+            raise OSC.OSCClientError("Endpoint is not connected")
+        self.transport.sendto(binary, self.client_address)
+
+    def sendto(self, msg, address, timeout=None):
+        """
+        Send an OSCMessage to the given (host, port)
+        :param msg:
+        :param address:
+        :param timeout: unused; datagram sends never block
+        :return:
+        """
+        self.transport.sendto(msg.getBinary(), address)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+
+@asyncio.coroutine
+def create_endpoint(local_address=("0.0.0.0", 10024), loop=None):
+    """
+    Bind an OSCProtocol endpoint to the given local (host, port).
+    :param local_address:
+    :param loop:
+    :return: the OSCProtocol
+    """
+    loop = loop or asyncio.get_event_loop()
+    transport, protocol = yield From(loop.create_datagram_endpoint(
+        lambda: OSCProtocol(loop), local_addr=local_address))
+    raise Return(protocol)
@@ -0,0 +1,121 @@
+"""
+Latest-value coalescing of outbound OSC messages
+"""
+import socket
+import threading
+import time
+from OSC import OSCClientError
+
+
+class Coalescer(threading.Thread):
+    """
+    Holds outbound packets per OSC address for up to `interval` seconds, and
+    then sends only the latest packet for each address. A fader sweep then
+    costs one packet per address per interval, instead of one per MIDI tick.
+    """
+
+    def __init__(self, client, interval=0.005, lost=None):
+        """
+        Initializer
+        :param client: OSC client to send with
+        :param interval: flush interval, in seconds
+        :param lost: optional function(addresses), called with the addresses
+                     whose packets a failed send dropped
+        :return:
+        """
+        self.client = client
+        self.interval = interval
+        self.lost = lost
+        self.pending = {}
+        self.order = []
+        self.deadline = None
+        self.condition = threading.Condition()
+        self.active = False
+        self.submitted = 0
+        self.sent = 0
+        self.errors = 0
+        self.last_error = None
+        super(Coalescer, self).__init__()
+        self.daemon = True
+
+    def submit(self, address, binary):
+        """
+        Queue an encoded packet, replacing any packet still pending for the
+        same address.
+        :param address: OSC address of the packet
+        :param binary: the encoded packet
+        :return:
+        """
+        with self.condition:
+            if address not in self.pending:
+                self.order.append(address)
+            self.pending[address] = binary
+            self.submitted += 1
+            if self.deadline is None:
+                self.deadline = time.time() + self.interval
+                self.condition.notify()
+
+    def flush(self):
+        """
+        Send everything pending now, in the order the addresses were first
+        submitted.
+        :return:
+        """
+        with self.condition:
+            self._flush()
+
+    def _flush(self):
+        pending = self.pending
+        order = self.order
+        self.pending = {}
+        self.order = []
+        self.deadline = None
+        # one call, so a batching client can send them all in one syscall
+        try:
+            self.client.sendRawMany([pending[address] for address in order])
+        except (socket.error, OSCClientError), e:
+            # e.g. the mixer refused the connection; the next flush retries
+            # with the next values, so keep the flush thread alive
+            self.errors += 1
+            self.last_error = str(e)
+            if self.lost is not None:
+                self.lost(order)
+            return
+        self.sent += len(order)
+
+    def run(self):
+        """
+        Thread run method
+        :return:
+        """
+        self.active = True
+        with self.condition:
+            while self.active:
+                if self.deadline is None:
+                    self.condition.wait()
+                    continue
+                delay = self.deadline - time.time()
+                if delay > 0:
+                    self.condition.wait(delay)
+                else:
+                    self._flush()
+
+    def stop(self):
+        """
+        Stop the flush thread, sending whatever is still pending
+        """
+        with self.condition:
+            self.active = False
+            self._flush()
+            self.condition.notify()
+
+    def get_stats(self):
+        """
+        :return: dict of counters
+        """
+        return {
+            'submitted': self.submitted,
+            'sent': self.sent,
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'pending': len(self.pending)}
@@ -1,224 +1,99 @@
 """
 Behringer OSC Mute Automation Controller
 """
+import itertools
 import threading
 import OSC
 from x18mixer import MixerElement, MuteElement, FaderElement, SnapElement, PanElement
+from coalescer import Coalescer
+from mixerstate import MixerState
+from subscription import Subscription
+from meters import MeterBank
+from mixercache import MixerCache, DEFAULT_PATH
 import netifaces
 import ipcalc
 import socket
-
-class BehringerController(threading.Thread):
-    def __init__(self, ip=None, port=10024, notifier=None):
-        self.ip = ip
-        self.ready = False
-        self.port = port
-        self.server = OSC.ThreadingOSCServer(("0.0.0.0", port))
-        self.client = OSC.OSCClient(server=self.server)
-        self.notifier = notifier
-        self.mixer_name = None
-        self.notify ( "Setting up listeners")
-        self.ready = False
-        self.info = {
-            'model': None,
-            'address': None,
-            'version': None,
-            'name': None}
-
-        self.info_call = MixerElement(
-            "/xinfo", self.client, self.server, self.info_callback)
-        self.server.handle_error = self.handle_error
-        self.snapshot_call = SnapElement(
-            "/-snap/load", self.client, self.server)
-        self.mixer = {
-            'ch': {},
-            'fxsend': {},
-            'bus': {},
-            'rtn': {},
-            'dca': {},
-            'send': {},
-            'mutegrp': {}}
-
-        for special_number in range(1, 5):
-            fader = "/dca/" + str(special_number) + "/fader"
-            mute = "/dca/" + str(special_number) + "/on"
-            self.mixer["dca"][str(special_number)] = {}
-            self.mixer["dca"][
-                str(special_number)]['fader'] = FaderElement(
-                fader, self.client, self.server)
-            self.mixer["dca"][
-                str(special_number)]['on'] = MuteElement(
-                mute, self.client, self.server)
-
-        for ch in range(1, 17):
-            if ch < 10:
-                channel_number = "0" + str(ch)
-            else:
-                channel_number = str(ch)
-
-            fader = "/ch/" + channel_number + "/mix/fader"
-            mute = "/ch/" + channel_number + "/mix/on"
-            pan = "/ch/" + channel_number + "/mix/pan"
-
-            self.mixer["ch"][channel_number] = {}
-            self.mixer["ch"][channel_number]['fader'] = FaderElement(
-                fader, self.client, self.server)
-            self.mixer["ch"][channel_number]['on'] = MuteElement(
-                mute, self.client, self.server)
-            self.mixer["ch"][channel_number]['pan'] = PanElement(
-                pan, self.client, self.server)
-
-        for rtn in range(1, 5):
-            rtn_number = str(rtn)
-
-            fader = "/rtn/" + rtn_number + "/mix/fader"
-            mute = "/rtn/" + rtn_number + "/mix/on"
-            pan = "/rtn/" + rtn_number + "/mix/pan"
-
-            self.mixer["ch"][rtn_number] = {}
-            self.mixer["ch"][rtn_number]['fader'] = FaderElement(
-                fader, self.client, self.server)
-            self.mixer["ch"][rtn_number]['on'] = MuteElement(
-                mute, self.client, self.server)
-            self.mixer["ch"][rtn_number]['pan'] = PanElement(
-                pan, self.client, self.server)
-
-        for bus in range(1, 7):
-            bus_number = str(bus)
-
-            fader = "/bus/" + bus_number + "/mix/fader"
-            mute = "/bus/" + bus_number + "/mix/on"
-            pan = "/bus/" + bus_number + "/mix/pan"
-
-            self.mixer["bus"][bus_number] = {}
-            self.mixer["bus"][bus_number]['fader'] = FaderElement(
-                fader, self.client, self.server)
-            self.mixer["bus"][bus_number]['on'] = MuteElement(
-                mute, self.client, self.server)
-            self.mixer["bus"][bus_number]['pan'] = PanElement(
-                pan, self.client, self.server)
-
-        for insert in ["fxsend", "rtn"]:
-            for insert_number in range(1, 5):
-                fader = "/" + insert + "/" + str(insert_number) + "/mix/fader"
-                mute = "/" + insert + "/" + str(insert_number) + "/mix/on"
-                self.mixer[insert][str(insert_number)] = {}
-                self.mixer[insert][
-                    str(insert_number)]['fader'] = FaderElement(
-                    fader, self.client, self.server)
-                self.mixer[insert][
-                    str(insert_number)]['on'] = MixerElement(
-                    mute, self.client, self.server)
-
-            for mutegroup_number in range(1, 5):
-                mute = "/config/mute/" + str(mutegroup_number)
-                self.mixer["mutegrp"][str(mutegroup_number)] = {}
-                self.mixer["mutegrp"][
-                    str(mutegroup_number)]['on'] = MixerElement(
-                    mute, self.client, self.server)
-
-        fader = "/rtn/aux/mix/fader"
-        mute = "/rtn/aux/mix/on"
-        self.mixer['rtn']['aux'] = {}
-        self.mixer['rtn']['aux']['fader'] = FaderElement(fader, self.client, self.server)
-        self.mixer['rtn']['aux']['on'] = MixerElement(mute, self.client, self.server)
-
-        super(BehringerController, self).__init__()
-
-    def notify(self, m):
-        if self.notifier:
-            self.notifier(m)
-        else:
-            print m
-
-    def run(self):
-        """
-        Thread run method
-        :return:
-        """
-        self.notify( "Starting OSC Connection" )
-        self.server.serve_forever()
-
-    def stop(self):
-        """
-        Stop method
-        """
-        self.notify( "Shutting down OSC Connector" )
-        self.server.close()
-
-    def handle_error(self, request, client_address):
-        """
-        Monkey patched handle_error.
-        """
-        pass
-
-    def find_mixer(self):
-        """
-        Find the first mixer on the net.
-        Basically block the server until /xinfo returns
-        """
-
-        self.ready = False
-        def get_net_size(netmask):
-            binary_str = ''
-            for octet in netmask:
-                binary_str += bin(int(octet))[2:].zfill(8)
-            return str(len(binary_str.rstrip('0')))
-
-        gws = netifaces.gateways()
-        interface = gws['default'][netifaces.AF_INET][1]
-        addrs = netifaces.ifaddresses(interface)
-        address = addrs[netifaces.AF_INET][0]['addr'].split('.')
-        netmask = addrs[netifaces.AF_INET][0]['netmask'].split('.')
-
-        net_start = [str(int(address[x]) & int(netmask[x])) for x in range(0, 4)]
-
-        cidr ='.'.join(net_start) + '/' + get_net_size(netmask)
-
-        netrange = []
-        for ip in ipcalc.Network(cidr):
-            netrange.append(str(ip))
-
-        while self.ready == False:
-            for ip in netrange:
-                mixer = (ip, self.port)
-                oscmsg = OSC.OSCMessage()
-                oscmsg.setAddress("/xinfo")
-                try:
-                    self.client.sendto(oscmsg, mixer, 1)
-                except socket.error:
-                    netrange.remove(ip)
-                except OSC.OSCClientError:
-                    netrange.remove(ip)
-
-        ip=self.info['address']
-        self.mixer_name = self.info["name"]
-        self.client.connect((ip, self.port))
-
-    def get_info(self):
-        """
-        Get mixer /info
+import time
+
+def _prefix_length(netmask):
+    """
+    Prefix length of a dotted netmask, e.g. 24 for 255.255.255.0
+    """
+    binary_str = ''
+    for octet in netmask.split('.'):
+        binary_str += bin(int(octet))[2:].zfill(8)
+    return len(binary_str.rstrip('0'))
+
+
+def interface_networks():
+    """
+    IPv4 networks of the machine's interfaces, loopback excluded
+    :return: list of (address, broadcast address, network in CIDR notation)
+    """
+    networks = []
+    for interface in netifaces.interfaces():
+        for addr in netifaces.ifaddresses(interface).get(netifaces.AF_INET, []):
+            if 'netmask' not in addr or addr['addr'].startswith('127.'):
+                continue
+            address = addr['addr'].split('.')
+            netmask = addr['netmask'].split('.')
+            net_start = [str(int(address[x]) & int(netmask[x]))
+                         for x in range(0, 4)]
+            broadcast = addr.get('broadcast') or '.'.join(
+                str(int(address[x]) | (~int(netmask[x]) & 255))
+                for x in range(0, 4))
+            cidr = '.'.join(net_start) + '/' + str(
+                _prefix_length(addr['netmask']))
+            networks.append((addr['addr'], broadcast, cidr))
+    return networks
+
+
+# discovery sweep packets sent between deadline and pacing checks
+SWEEP_BATCH = 16
+
+
+ELEMENT_TYPES = {
+    'fader': FaderElement,
+    'on': MuteElement,
+    'pan': PanElement}
+
+
+def build_elements(client, server, state, coalescer=None):
+    """
+    Builds an element for every parameter of the mixer state
+    :param client: OSC client the elements send with
+    :param server: OSC server the elements register their handlers with
+    :param state: MixerState the elements keep their values in
+    :param coalescer: optional Coalescer for fader and pan values
+    :return: {address: element}
+    """
+    elements = {}
+    for strip, number, parameter, address in state.items():
+        element_coalescer = None
+        if parameter in ('fader', 'pan'):
+            element_coalescer = coalescer
+        elements[address] = ELEMENT_TYPES[parameter](
+            address, client, server, coalescer=element_coalescer,
+            state=state)
+    return elements
+
+
+class MixerCommands(object):
+    """
+    Mixer commands shared by the controllers. Expects self.state,
+    self.elements (see build_elements), self.snapshot_call and
+    self.coalescer.
+    """
+
+    def element(self, strip, number, parameter):
+        """
+        The element of a mixer parameter
+        :param strip: strip type, e.g. 'ch'
+        :param number: strip number as used in the address, e.g. '01'
+        :param parameter: 'fader', 'on' or 'pan'
         :return:
         """
-        self.info_call.get()
-
-    def info_callback(self, call, param, response, device):
-        """
-        info callback
-        :param call:
-        :param param:
-        :param response:
-        :param device:
-        :return:
-        """
-        self.info['call'] = call
-        self.info['param'] = param
-        self.info['device'] = device
-        self.info['address'] = response[0]
-        self.info['name'] = response[1]
-        self.info['model'] = response[2]
-        self.info['version'] = response[3]
-        self.ready = True
+        return self.elements[self.state.address(strip, number, parameter)]
 
     def snapshot(self, snapshot):
         """
@@ -226,8 +101,15 @@ class BehringerController(threading.Thread):
         :param snapshot:
         :return:
         """
-
+        # pending fader moves go out first, so they can't land on top
+        # of the snapshot
+        if self.coalescer is not None:
+            self.coalescer.flush()
         self.snapshot_call.set(snapshot)
+        # the snapshot replaces the values we knew, so none of them may
+        # suppress the next set
+        for element in self.elements.values():
+            element.invalidate()
 
     def set_return_fader(self, channel, amount):
         """
@@ -237,7 +119,7 @@ class BehringerController(threading.Thread):
         :return:
         """
         c = str(channel)
-        self.mixer["rtn"][c]["fader"].set(amount)
+        self.element("rtn", c, "fader").set(amount)
 
     def set_return_mute(self, channel, value):
         """
@@ -253,7 +135,7 @@ class BehringerController(threading.Thread):
             amount = 1
 
         c = str(channel)
-        self.mixer["rtn"][c]["on"].set(amount)
+        self.element("rtn", c, "on").set(amount)
 
     def set_bus_fader(self, channel, amount):
         """
@@ -263,7 +145,7 @@ class BehringerController(threading.Thread):
         :return:
         """
         c = str(channel)
-        self.mixer["bus"][c]["fader"].set(amount)
+        self.element("bus", c, "fader").set(amount)
 
     def set_bus_mute(self, channel, value):
         """
@@ -279,7 +161,7 @@ class BehringerController(threading.Thread):
             amount = 1
 
         c = str(channel)
-        self.mixer["bus"][c]["on"].set(amount)
+        self.element("bus", c, "on").set(amount)
 
     def set_fxsend_fader(self, channel, amount):
         """
@@ -289,7 +171,7 @@ class BehringerController(threading.Thread):
         :return:
         """
         c = str(channel)
-        self.mixer["fxsend"][c]["fader"].set(amount)
+        self.element("fxsend", c, "fader").set(amount)
 
     def set_fxsend_mute(self, channel, value):
         """
@@ -305,7 +187,7 @@ class BehringerController(threading.Thread):
             amount = 1
 
         c = str(channel)
-        self.mixer["fxsend"][c]["on"].set(amount)
+        self.element("fxsend", c, "on").set(amount)
 
     def set_dca_fader(self, channel, amount):
         """
@@ -315,7 +197,7 @@ class BehringerController(threading.Thread):
         :return:
         """
         c = str(channel)
-        self.mixer["dca"][c]["fader"].set(amount)
+        self.element("dca", c, "fader").set(amount)
 
     def set_mute_group_mute(self, channel, value):
         """
@@ -331,7 +213,7 @@ class BehringerController(threading.Thread):
             amount = 1
 
         c = str(channel)
-        self.mixer["mutegrp"][c]["on"].set(amount)
+        self.element("mutegrp", c, "on").set(amount)
 
     def set_dca_mute(self, channel, value):
         """
@@ -347,7 +229,7 @@ class BehringerController(threading.Thread):
             amount = 1
 
         c = str(channel)
-        self.mixer["dca"][c]["on"].set(amount)
+        self.element("dca", c, "on").set(amount)
 
     def set_channel_fader(self, channel, amount):
         """
@@ -360,7 +242,7 @@ class BehringerController(threading.Thread):
             c = "0" + str(channel)
         else:
             c = str(channel)
-        self.mixer["ch"][c]["fader"].set(amount)
+        self.element("ch", c, "fader").set(amount)
 
     def set_channel_mute(self, channel, value):
         """
@@ -379,7 +261,7 @@ class BehringerController(threading.Thread):
         else:
             amount = 1
 
-        self.mixer["ch"][c]["on"].set(amount)
+        self.element("ch", c, "on").set(amount)
 
     def set_channel_pan(self, channel, amount):
         """
@@ -392,4 +274,463 @@ class BehringerController(threading.Thread):
             c = "0" + str(channel)
         else:
             c = str(channel)
-        self.mixer["ch"][c]["pan"].set(amount)
+        self.element("ch", c, "pan").set(amount)
+
+
+class BehringerController(MixerCommands, threading.Thread):
+    def __init__(self, ip=None, port=10024, notifier=None,
+                 flush_interval=0.005, stale_after=1.0,
+                 cache_path=DEFAULT_PATH, mixer_port=None, batch=32):
+        """
+        Initializer
+        :param ip:
+        :param port:
+        :param notifier:
+        :param flush_interval: seconds fader and pan moves are coalesced
+                               for; 0 sends every move immediately
+        :param stale_after: seconds a known mixer value suppresses sets of
+                            the same value; 0 sends every set
+        :param cache_path: file remembering the last connected mixers, or
+                           None to always scan
+        :param mixer_port: port the mixer listens on, if not `port`; e.g.
+                           for an emulator on the same host
+        :param batch: datagrams read or written per recvmmsg/sendmmsg call
+                      on Linux; 0 reads and writes one at a time
+        :return:
+        """
+        self.ip = ip
+        self.ready = False
+        self.port = port
+        self.mixer_port = mixer_port or port
+        self.server = OSC.PooledOSCServer(("0.0.0.0", port), batch=batch)
+        self.client = OSC.OSCClient(server=self.server)
+        self.client.setBatchSize(batch)
+        self.coalescer = None
+        if flush_interval:
+            self.coalescer = Coalescer(self.client, flush_interval,
+                                       self.packets_lost)
+            self.coalescer.start()
+        self.notifier = notifier
+        self.mixer_name = None
+        self.sync_report = None
+        self.discovered = {}
+        self.discovery_lock = threading.Lock()
+        self.discovery_event = threading.Event()
+        self.sweep = None
+        self.cache = None
+        if cache_path:
+            self.cache = MixerCache(cache_path)
+        self.notify ( "Setting up listeners")
+        self.ready = False
+        self.info = {
+            'model': None,
+            'address': None,
+            'version': None,
+            'name': None}
+
+        self.info_call = MixerElement(
+            "/xinfo", self.client, self.server, self.info_callback)
+        self.server.handle_error = self.handle_error
+        # with /xremote the mixer pushes every change, including parameters
+        # we have no element for
+        self.unhandled = 0
+        self.server.addMsgHandler('default', self.unhandled_callback)
+        self.xremote = None
+        self.meters = {}
+        self.meter_subscriptions = {}
+        self.snapshot_call = SnapElement(
+            "/-snap/load", self.client, self.server)
+        self.state = MixerState()
+        self.elements = build_elements(
+            self.client, self.server, self.state, self.coalescer)
+        for element in self.elements.values():
+            element.stale_after = stale_after
+
+        super(BehringerController, self).__init__()
+
+    def notify(self, m):
+        if self.notifier:
+            self.notifier(m)
+        else:
+            print m
+
+    def packets_lost(self, addresses):
+        """
+        Coalescer callback: the latest sets of these addresses were never
+        sent, so they must not suppress the same sets again
+        :param addresses:
+        :return:
+        """
+        for address in addresses:
+            element = self.elements.get(address)
+            if element is not None:
+                element.lost()
+
+    def run(self):
+        """
+        Thread run method
+        :return:
+        """
+        self.notify( "Starting OSC Connection" )
+        self.server.serve_forever()
+
+    def stop(self):
+        """
+        Stop method
+        """
+        self.notify( "Shutting down OSC Connector" )
+        if self.coalescer is not None:
+            self.coalescer.stop()
+        if self.xremote is not None:
+            self.xremote.stop()
+        for bank in self.meter_subscriptions.keys():
+            self.stop_meters(bank)
+        self.server.close()
+
+    def handle_error(self, request, client_address):
+        """
+        Monkey patched handle_error.
+        """
+        pass
+
+    def schedule(self, delay, callback, *args):
+        """
+        Call callback(*args) after `delay` seconds, from the OSC server's
+        scheduler thread; e.g. schedule(2.0, self.set_channel_mute, 3, 1)
+        for a timed send.
+        :param delay: seconds
+        :param callback:
+        :return: handle for cancel()
+        :raises OSC.OSCServerError: after stop()
+        """
+        return self.server.getScheduler().schedule(
+            time.time() + delay, callback, *args)
+
+    def cancel(self, handle):
+        """
+        Cancel a call made with schedule()
+        :param handle:
+        :return: False if it already ran or was cancelled
+        """
+        return self.server.getScheduler().cancel(handle)
+
+    def unhandled_callback(self, call, param, response, device):
+        """
+        Counts messages for addresses without an element
+        """
+        self.unhandled += 1
+
+    def subscribe(self, interval=8.0):
+        """
+        Subscribe to /xremote change notifications, renewing the
+        subscription every `interval` seconds. Pushed changes reach the
+        elements through their handlers, like replies to get() do.
+        :param interval: seconds between renewals; the mixer expires the
+                         subscription after about 10 seconds
+        :return:
+        """
+        if self.xremote is not None:
+            self.xremote.stop()
+        self.xremote = Subscription(self.client, "/xremote",
+                                    interval=interval)
+        self.xremote.start()
+
+    def start_meters(self, bank, history=64, interval=8.0):
+        """
+        Subscribe to a meter bank (/meters/N) and keep a history of its
+        levels. The subscription is renewed every `interval` seconds.
+        :param bank: meter bank number
+        :param history: number of frames to keep for peak and RMS queries
+        :param interval: seconds between renewals
+        :return: the MeterBank
+        """
+        address = "/meters/%d" % bank
+        if bank in self.meter_subscriptions:
+            self.meter_subscriptions[bank].stop()
+        meters = MeterBank(address, history)
+        self.meters[bank] = meters
+        self.server.addMsgHandler(address, meters.handler)
+        subscription = Subscription(self.client, "/meters", [address],
+                                    interval=interval)
+        self.meter_subscriptions[bank] = subscription
+        subscription.start()
+        return meters
+
+    def stop_meters(self, bank):
+        """
+        Stop renewing a meter bank subscription. The MeterBank keeps its
+        history.
+        :param bank: meter bank number
+        :return:
+        """
+        self.meter_subscriptions.pop(bank).stop()
+        self.server.delMsgHandler("/meters/%d" % bank)
+
+    def find_mixer(self, timeout=2.0, probe_timeout=0.5):
+        """
+        Find the first mixer on the net. The mixers in the cache are probed
+        first; if none of them answers, blocks until a mixer answers,
+        discovering again every `timeout` seconds.
+        :param timeout: seconds per discovery round
+        :param probe_timeout: seconds to wait for a cached mixer
+        """
+        mixers = []
+        if self.cache is not None:
+            known = [mixer['address'] for mixer in self.cache.load()]
+            if known:
+                mixers = self.probe(known, probe_timeout)
+        while not mixers:
+            mixers = self.discover(timeout, count=1)
+        self.connect(mixers[0])
+
+    def connect(self, mixer):
+        """
+        Connect to a discovered mixer, subscribe to its changes and sync
+        its state. A sync that fails or is incomplete doesn't fail the
+        connection: the missing values fill in as the mixer reports them.
+        :param mixer: info dict, as returned by discover()
+        :return:
+        """
+        self.info.update(mixer)
+        self.mixer_name = mixer['name']
+        self.client.connect((mixer['address'], self.mixer_port))
+        if self.cache is not None:
+            self.cache.remember(mixer)
+        self.subscribe()
+        try:
+            self.sync_state()
+        except (socket.error, OSC.OSCError), e:
+            self.notify("State sync failed: %s" % e)
+
+    def discover(self, timeout=2.0, count=None, sweep=True,
+                 broadcast_wait=0.5, sweep_rate=2000.0):
+        """
+        Find mixers by broadcasting /xinfo on every interface. If no mixer
+        answers within `broadcast_wait` seconds, /xinfo is unicast to every
+        address of every interface's network, interleaving the networks. A
+        sweep that runs out of time resumes where it stopped on the next
+        call, so repeated rounds cover even a /16.
+        :param timeout: seconds to collect answers for
+        :param count: return as soon as this many mixers answered
+        :param sweep: fall back to the unicast sweep
+        :param broadcast_wait: seconds to wait for a broadcast answer before
+                               sweeping
+        :param sweep_rate: sweep packets per second
+        :return: list of info dicts of the mixers that answered
+        """
+        deadline = time.time() + timeout
+        self._reset_discovery()
+        networks = interface_networks()
+        xinfo = OSC.OSCMessage("/xinfo")
+
+        self.client.socket.setsockopt(
+            socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        broadcasts = set(["255.255.255.255"])
+        broadcasts.update(network[1] for network in networks)
+        for address in broadcasts:
+            self._send_xinfo(xinfo, address)
+
+        def done():
+            return count is not None and len(self.discovered) >= count
+
+        self.discovery_event.wait(min(broadcast_wait, timeout))
+        if sweep and not self.discovered:
+            addresses = self._sweep_addresses(networks)
+            interval = float(SWEEP_BATCH) / sweep_rate
+            next_batch = time.time()
+            while not done():
+                now = time.time()
+                if now >= deadline:
+                    break
+                if now < next_batch:
+                    time.sleep(min(next_batch, deadline) - now)
+                    continue
+                batch = list(itertools.islice(addresses, SWEEP_BATCH))
+                if not batch:
+                    # swept everything; the next round starts over
+                    self.sweep = None
+                    break
+                for address in batch:
+                    self._send_xinfo(xinfo, address)
+                next_batch += interval
+
+        return self._collect(deadline, count)
+
+    def _sweep_addresses(self, networks):
+        """
+        The sweep's address iterator: the one an earlier round left off,
+        or a new one if the networks changed
+        """
+        key = tuple(network[2] for network in networks)
+        if self.sweep is None or self.sweep[0] != key:
+            hosts = [ipcalc.Network(cidr) for cidr in key]
+            addresses = (str(ip) for ips in itertools.izip_longest(*hosts)
+                         for ip in ips if ip is not None)
+            self.sweep = (key, addresses)
+        return self.sweep[1]
+
+    def probe(self, addresses, timeout=0.5):
+        """
+        Unicast /xinfo to the given addresses
+        :param addresses: IP addresses
+        :param timeout: seconds to wait for an answer
+        :return: list of info dicts; returns as soon as one mixer answered
+        """
+        deadline = time.time() + timeout
+        self._reset_discovery()
+        xinfo = OSC.OSCMessage("/xinfo")
+        for address in addresses:
+            self._send_xinfo(xinfo, address)
+        return self._collect(deadline, 1)
+
+    def _reset_discovery(self):
+        with self.discovery_lock:
+            self.discovered = {}
+        self.discovery_event.clear()
+
+    def _collect(self, deadline, count):
+        """
+        Wait for /xinfo answers until the deadline, or until `count` mixers
+        answered
+        """
+        while True:
+            self.discovery_event.clear()
+            if count is not None and len(self.discovered) >= count:
+                break
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            self.discovery_event.wait(remaining)
+        with self.discovery_lock:
+            return self.discovered.values()
+
+    def _send_xinfo(self, message, ip):
+        try:
+            self.client.sendto(message, (ip, self.mixer_port), 1)
+        except socket.error:
+            pass
+        except OSC.OSCClientError:
+            pass
+
+    def sync_state(self, window=16, timeout=1.0, query_timeout=0.25,
+                   retries=2):
+        """
+        Query every mixer parameter, keeping at most `window` queries
+        unanswered at a time, so the state fills at network speed instead of
+        one round trip per parameter. Unanswered parameters are queried
+        again up to `retries` times. Nothing more is sent once `timeout` is
+        up; parameters not queried by then are reported missing.
+        :param window: maximum number of unanswered queries
+        :param timeout: seconds the whole sync may take
+        :param query_timeout: seconds before an unanswered query stops
+                              counting against the window
+        :param retries:
+        :return: dict with 'requested', 'received', 'missing', 'errors'
+                 (queries that couldn't be sent) and 'elapsed'
+        """
+        addresses = [address for strip, number, parameter, address
+                     in self.state.items()]
+        outstanding = set(addresses)
+        in_flight = {}
+        errors = []
+        condition = threading.Condition()
+
+        def reported(address, value):
+            with condition:
+                outstanding.discard(address)
+                if in_flight.pop(address, None) is not None:
+                    condition.notify()
+
+        def wait_for_window(deadline, size):
+            """
+            :return: True once fewer than `size` queries are in flight,
+                     False if the deadline came first
+            """
+            while True:
+                now = time.time()
+                for address, sent_at in in_flight.items():
+                    if now - sent_at >= query_timeout:
+                        del in_flight[address]
+                if len(in_flight) < size:
+                    return True
+                if now >= deadline:
+                    return False
+                condition.wait(min(query_timeout, deadline - now))
+
+        start = time.time()
+        deadline = start + timeout
+        self.state.add_listener(reported)
+        try:
+            for attempt in range(retries + 1):
+                with condition:
+                    queries = [address for address in addresses
+                               if address in outstanding]
+                for address in queries:
+                    with condition:
+                        # past the deadline the window would stay full;
+                        # sending the rest anyway would burst them all
+                        if time.time() >= deadline or \
+                                not wait_for_window(deadline, window):
+                            break
+                        if address not in outstanding:
+                            continue
+                        in_flight[address] = time.time()
+                    try:
+                        self.elements[address].get()
+                    except (socket.error, OSC.OSCError), e:
+                        # stays outstanding: retried, or reported missing
+                        errors.append(e)
+                with condition:
+                    wait_for_window(deadline, 1)
+                if not outstanding or time.time() >= deadline:
+                    break
+        finally:
+            self.state.remove_listener(reported)
+
+        elapsed = time.time() - start
+        self.sync_report = {
+            'requested': len(addresses),
+            'received': len(addresses) - len(outstanding),
+            'missing': sorted(outstanding),
+            'errors': len(errors),
+            'elapsed': elapsed}
+        self.notify("Synced %d of %d parameters in %d ms" % (
+            self.sync_report['received'], len(addresses), elapsed * 1000))
+        if outstanding:
+            self.notify("%d parameters did not sync%s" % (
+                len(outstanding),
+                errors and " (%d send errors, last: %s)" % (
+                    len(errors), errors[-1]) or ""))
+        return self.sync_report
+
+    def get_info(self):
+        """
+        Get mixer /info
+        :return:
+        """
+        self.info_call.get()
+
+    def info_callback(self, call, param, response, device):
+        """
+        info callback
+        :param call:
+        :param param:
+        :param response:
+        :param device:
+        :return:
+        """
+        self.info['call'] = call
+        self.info['param'] = param
+        self.info['device'] = device
+        self.info['address'] = response[0]
+        self.info['name'] = response[1]
+        self.info['model'] = response[2]
+        self.info['version'] = response[3]
+        with self.discovery_lock:
+            self.discovered[response[0]] = {
+                'address': response[0],
+                'name': response[1],
+                'model': response[2],
+                'version': response[3]}
+        self.discovery_event.set()
+        self.ready = True
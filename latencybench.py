@@ -0,0 +1,248 @@
+"""
+End-to-end MIDI -> OSC -> echo latency benchmark, against a local
+X18Emulator. Synthetic MIDI goes straight into a MidiInputHandler; the
+benchmark times each message until its OSC datagram reaches the emulator
+("send"), and until the emulator's echo updates the mixer state ("echo").
+
+Usage:
+    python latencybench.py [sweep] [notes] [program] [--count n]
+                           [--rate messages/s] [--latency ms] [--loss f]
+                           [--flush ms] [--output file]
+
+Prints one JSON document. A rate of 0 injects each stream as one burst.
+"""
+import json
+import math
+import sys
+import threading
+import time
+import controller
+import midireceiver
+import x18emulator
+
+SCENARIOS = ("sweep", "notes", "program")
+
+
+def sweep(count):
+    """
+    DCA fader sweeps (CC 14) on MIDI channels 1-4, up and down
+    :return: list of (message, address, value)
+    """
+    stream = []
+    for i in range(count):
+        channel = i % 4
+        step = (i // 4) % 254
+        value = step if step < 127 else 254 - step
+        stream.append(([midireceiver.CONTROL_OFFSET + channel, 14, value],
+                       "/dca/%d/fader" % (channel + 1), value * 8 - 1))
+    return stream
+
+
+def notes(count):
+    """
+    Channel mute note on/off bursts over the 16 channel mute notes
+    :return: list of (message, address, value)
+    """
+    stream = []
+    for i in range(count):
+        strip = i % 16
+        on = (i // 16) % 2 == 0
+        status = midireceiver.NOTE_ON_OFFSET if on else \
+            midireceiver.NOTE_OFF_OFFSET
+        stream.append(([status, midireceiver.CHANNEL_MUTE + strip, 100],
+                       "/ch/%02d/mix/on" % (strip + 1), 0 if on else 1))
+    return stream
+
+
+def program(count):
+    """
+    Program changes cycling through 8 snapshots
+    :return: list of (message, address, value)
+    """
+    return [([midireceiver.PROGRAM_OFFSET, i % 8], "/-snap/load", i % 8)
+            for i in range(count)]
+
+
+def percentiles(samples):
+    """
+    :param samples: latencies in seconds
+    :return: dict of count, mean, p50, p99, p999 and max, in milliseconds
+    """
+    if not samples:
+        return {'count': 0}
+    samples = sorted(samples)
+
+    def rank(p):
+        return samples[min(len(samples) - 1,
+                           max(int(math.ceil(p * len(samples))) - 1, 0))]
+    return {
+        'count': len(samples),
+        'mean': 1000.0 * sum(samples) / len(samples),
+        'p50': 1000.0 * rank(0.50),
+        'p99': 1000.0 * rank(0.99),
+        'p999': 1000.0 * rank(0.999),
+        'max': 1000.0 * samples[-1]}
+
+
+class _Matcher(object):
+    """
+    Matches observed (address, value) events to injected messages. An
+    observation matches the oldest injection of that value on that
+    address; older injections on the address were superseded (coalesced).
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.latencies = []
+        self.superseded = 0
+        self.last_seen = {}
+        self.last_match = None
+        self.lock = threading.Lock()
+
+    def injected(self, address, value, stamp):
+        with self.lock:
+            self.pending.setdefault(address, []).append((value, stamp))
+
+    def observed(self, address, value):
+        now = time.time()
+        with self.lock:
+            self.last_seen[address] = value
+            pending = self.pending.get(address)
+            if not pending:
+                return
+            for position, (expected, stamp) in enumerate(pending):
+                if expected == value:
+                    self.latencies.append(now - stamp)
+                    self.last_match = now
+                    self.superseded += position
+                    del pending[:position + 1]
+                    return
+
+
+def run_scenario(name, count, rate, latency, loss, flush_interval):
+    """
+    Run one scenario against a fresh emulator and controller
+    :return: dict of results
+    """
+    emulator = x18emulator.X18Emulator(("127.0.0.1", 0), latency=latency,
+                                       loss=loss, seed=1, echo=True)
+    emulator.start()
+    osc = controller.BehringerController(
+        port=0, mixer_port=emulator.address()[1], notifier=lambda m: None,
+        flush_interval=flush_interval, cache_path=None)
+    osc.start()
+    sent = _Matcher()
+    echoed = _Matcher()
+    try:
+        osc.connect(osc.probe([emulator.address()[0]], 1.0)[0])
+
+        handle = emulator.handle
+
+        def timed(addr, tags, data, client_address):
+            if data:
+                sent.observed(addr, data[0])
+            return handle(addr, tags, data, client_address)
+        emulator.server.addMsgHandler('default', timed)
+        osc.state.add_listener(echoed.observed)
+
+        handler = midireceiver.MidiInputHandler(osc)
+        active = [True]
+
+        def worker():
+            while active[0]:
+                if not handler.drain():
+                    handler.wakeup.clear()
+                    if active[0]:
+                        handler.wakeup.wait(handler.wait_time())
+        drain = threading.Thread(target=worker)
+        drain.start()
+
+        stream = globals()[name](count)
+        final = {}
+        start = time.time()
+        for position, (message, address, value) in enumerate(stream):
+            if rate:
+                delay = start + position / float(rate) - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+            stamp = time.time()
+            sent.injected(address, value, stamp)
+            if address in osc.state.index:
+                echoed.injected(address, value, stamp)
+            final[address] = value
+            handler((message, 0.0))
+
+        # wait for the final values to settle
+        deadline = time.time() + 2.0 + latency * 4
+        while time.time() < deadline:
+            with sent.lock:
+                if all(sent.last_seen.get(address) == value
+                       for address, value in final.items()):
+                    break
+            time.sleep(0.005)
+        elapsed = (sent.last_match or time.time()) - start
+        time.sleep(latency * 2 + 0.05)
+        active[0] = False
+        handler.wakeup.set()
+        drain.join()
+    finally:
+        osc.stop()
+        osc.join()
+        emulator.stop()
+
+    stats = handler.get_stats()
+    client_stats = osc.client.getStats()
+    return {
+        'scenario': name,
+        'injected': len(stream),
+        'rate': rate,
+        'elapsed': elapsed,
+        'throughput': len(stream) / elapsed if elapsed else None,
+        'send': percentiles(sent.latencies),
+        'echo': percentiles(echoed.latencies),
+        'superseded': sent.superseded,
+        'drops': sum(1 for address, value in final.items()
+                     if sent.last_seen.get(address) != value),
+        'midi_dropped': stats['dropped'],
+        'midi_coalesced': stats['coalesced'],
+        'osc_dropped': client_stats.get('dropped'),
+        'send_batch': client_stats.get('send_batch'),
+        'recv_batch': osc.server.getStats().get('recv_batch'),
+        'emulator_lost': emulator.get_stats()['lost']}
+
+
+def main(argv):
+    options = {'--count': 5000, '--rate': 2000.0, '--latency': 0.0,
+               '--loss': 0.0, '--flush': 5.0, '--output': None}
+    scenarios = []
+    args = argv[1:]
+    try:
+        while args:
+            arg = args.pop(0)
+            if arg in options:
+                options[arg] = args.pop(0)
+            elif arg in SCENARIOS:
+                scenarios.append(arg)
+            else:
+                raise ValueError(arg)
+        count = int(options['--count'])
+        rate = float(options['--rate'])
+        latency = float(options['--latency']) / 1000.0
+        loss = float(options['--loss'])
+        flush_interval = float(options['--flush']) / 1000.0
+    except (IndexError, ValueError):
+        print __doc__
+        return 1
+
+    results = [run_scenario(name, count, rate, latency, loss, flush_interval)
+               for name in scenarios or SCENARIOS]
+    output = json.dumps({'results': results}, indent=2, sort_keys=True)
+    if options['--output']:
+        with open(options['--output'], "w") as out:
+            out.write(output)
+    print output
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,159 @@
+"""
+Meter stream decoding and history
+"""
+import array
+import math
+import struct
+import sys
+import threading
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# meter values are signed 16 bit, in 1/256 dB
+SCALE = 1 / 256.0
+FLOOR = -128.0
+
+_count = struct.Struct('<i')
+
+
+def decode_blob(blob):
+    """
+    Decode a meter blob: a little-endian int32 count followed by that many
+    little-endian int16 values in 1/256 dB.
+    :param blob: the blob as a string
+    :return: the levels in dB, as a NumPy array (or array.array('d'))
+    """
+    count = min(_count.unpack_from(blob)[0], (len(blob) - 4) // 2)
+    if numpy is not None:
+        return numpy.frombuffer(blob, '<i2', count, 4) * SCALE
+    values = array.array('h', blob[4:4 + 2 * count])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return array.array('d', [value * SCALE for value in values])
+
+
+class MeterBank(object):
+    """
+    History of one meter bank (/meters/N): a ring buffer holding the last
+    `history` frames, one row of levels in dB per received blob.
+    """
+
+    def __init__(self, address, history=64):
+        """
+        Initializer
+        :param address: OSC address of the bank, e.g. '/meters/1'
+        :param history: number of frames to keep
+        :return:
+        """
+        self.address = address
+        self.history = history
+        self.count = None
+        self.levels = None
+        self.position = 0
+        self.filled = 0
+        self.received = 0
+        self.lock = threading.Lock()
+
+    def _allocate(self, count):
+        self.count = count
+        if numpy is not None:
+            self.levels = numpy.full((self.history, count), FLOOR)
+        else:
+            self.levels = [array.array('d', [FLOOR] * count)
+                           for _ in range(self.history)]
+        self.position = 0
+        self.filled = 0
+
+    def handler(self, call, param, response, device):
+        """
+        OSC handler for the bank's address
+        :param call:
+        :param param:
+        :param response: [blob]
+        :param device:
+        :return:
+        """
+        self.add(response[0])
+
+    def add(self, blob):
+        """
+        Decode a blob into the next ring buffer row
+        :param blob:
+        :return:
+        """
+        count = min(_count.unpack_from(blob)[0], (len(blob) - 4) // 2)
+        with self.lock:
+            if count != self.count:
+                self._allocate(count)
+            if numpy is not None:
+                row = self.levels[self.position]
+                row[:] = numpy.frombuffer(blob, '<i2', count, 4)
+                row *= SCALE
+            else:
+                self.levels[self.position] = decode_blob(blob)
+            self.position = (self.position + 1) % self.history
+            if self.filled < self.history:
+                self.filled += 1
+            self.received += 1
+
+    def _recent(self, frames):
+        """
+        The most recent frames, oldest first. Call with the lock held.
+        :param frames: number of frames, or None for the whole history
+        :return: 2-D array (or list of rows)
+        """
+        if frames is None or frames > self.filled:
+            frames = self.filled
+        if numpy is not None:
+            slots = numpy.arange(self.position - frames, self.position)
+            return self.levels[slots % self.history]
+        return [self.levels[(self.position - frames + i) % self.history]
+                for i in range(frames)]
+
+    def latest(self):
+        """
+        :return: the levels of the most recent frame in dB, or None
+        """
+        with self.lock:
+            if not self.filled:
+                return None
+            row = self.levels[(self.position - 1) % self.history]
+            if numpy is not None:
+                return row.copy()
+            return array.array('d', row)
+
+    def peak(self, frames=None):
+        """
+        Peak-hold level of each meter over the recent frames
+        :param frames: number of frames, or None for the whole history
+        :return: levels in dB, or None before the first frame
+        """
+        with self.lock:
+            if not self.filled:
+                return None
+            rows = self._recent(frames)
+            if numpy is not None:
+                return rows.max(axis=0)
+            return array.array('d', [max(column) for column in zip(*rows)])
+
+    def rms(self, frames=None):
+        """
+        RMS level of each meter over the recent frames, averaged in power
+        rather than in dB
+        :param frames: number of frames, or None for the whole history
+        :return: levels in dB, or None before the first frame
+        """
+        with self.lock:
+            if not self.filled:
+                return None
+            rows = self._recent(frames)
+            if numpy is not None:
+                power = numpy.power(10.0, rows / 10.0).mean(axis=0)
+                return 10.0 * numpy.log10(power)
+            out = array.array('d')
+            for column in zip(*rows):
+                power = sum(10.0 ** (level / 10.0) for level in column)
+                out.append(10.0 * math.log10(power / len(column)))
+            return out
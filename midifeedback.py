@@ -0,0 +1,320 @@
+"""
+MIDI feedback: mirrors mixer state back to the control surface
+"""
+import threading
+import time
+from midimap import (CONTROL_OFFSET, NOTE_ON_OFFSET, NOTE_OFF_OFFSET,
+                     LSB_OFFSET, NRPN_MSB, NRPN_LSB, DATA_ENTRY_MSB,
+                     DATA_ENTRY_LSB, DEFAULT_MAPPING, MappingError,
+                     check_mapping, table_index)
+
+
+def inverse_scale(rule, size=128):
+    """
+    The inverse of midimap.scale_table: MIDI value of an element value
+    :param rule: rule with optional "in" and "out" ranges
+    :param size: number of MIDI values; 128, or 16384 for 14-bit values
+    :return: function(value) -> MIDI value
+    """
+    in_low, in_high = rule.get("in", (0, size - 1))
+    out_low, out_high = rule.get("out", (0, size - 1))
+    lowest, highest = min(in_low, in_high), max(in_low, in_high)
+    if out_high == out_low:
+        return lambda value: lowest
+    step = float(in_high - in_low) / (out_high - out_low)
+
+    def scale(value):
+        midi = int(round(in_low + (value - out_low) * step))
+        return min(max(midi, lowest), highest)
+    return scale
+
+
+def feedback_map(osc_controller, mapping=DEFAULT_MAPPING):
+    """
+    Reverse a mapping: for every mapped element address, a function that
+    turns the element's value into the MIDI messages that show it. Note and
+    NRPN rules map the same strips on every channel they list; their
+    messages go out on the given MIDI channel (0-15), by default the
+    first one listed.
+    :param osc_controller: a controller with the MixerCommands methods
+    :param mapping: see midimap
+    :return: ({address: function(value, midi_channel=None) -> messages},
+              {table index of an input message, or (status, NRPN number)
+               of an NRPN input: address})
+    :raises MappingError: for a mapping that can't be reversed
+    """
+    rules = check_mapping(mapping)
+    try:
+        return _feedback_map(osc_controller, rules)
+    except (KeyError, TypeError, ValueError, AttributeError), e:
+        raise MappingError("can't reverse mapping: %r" % (e,))
+
+
+def _feedback_map(osc_controller, rules):
+    outputs = {}
+    inputs = {}
+    numbers = dict((strip, strip_numbers) for strip, strip_numbers, prefix,
+                   parameters in osc_controller.state.layout)
+
+    def address(rule, strip):
+        try:
+            number = numbers[rule["strip"]][strip - 1]
+        except IndexError:
+            return None
+        return osc_controller.state.address(rule["strip"], number,
+                                            rule["parameter"])
+
+    def cc(status, controller, scale):
+        return lambda value, midi_channel=None: \
+            [[status, controller, scale(value)]]
+
+    def cc14(status, controller, scale):
+        def messages(value, midi_channel=None):
+            value = scale(value)
+            return [[status, controller, value >> 7],
+                    [status, controller + LSB_OFFSET, value & 127]]
+        return messages
+
+    def nrpn(default_channel, number, scale):
+        def messages(value, midi_channel=None):
+            if midi_channel is None:
+                midi_channel = default_channel
+            status = CONTROL_OFFSET + midi_channel
+            value = scale(value)
+            return [[status, NRPN_MSB, number >> 7],
+                    [status, NRPN_LSB, number & 127],
+                    [status, DATA_ENTRY_MSB, value >> 7],
+                    [status, DATA_ENTRY_LSB, value & 127]]
+        return messages
+
+    def note(default_channel, number, on_value):
+        def messages(value, midi_channel=None):
+            if midi_channel is None:
+                midi_channel = default_channel
+            if value == on_value:
+                return [[NOTE_ON_OFFSET + midi_channel, number, 127]]
+            return [[NOTE_OFF_OFFSET + midi_channel, number, 0]]
+        return messages
+
+    for rule in rules:
+        kind = rule.get("message")
+        channels = [channel - 1 for channel in
+                    rule.get("channels", range(1, 17))]
+        if kind in ("cc", "cc14"):
+            size = 128 if kind == "cc" else 1 << 14
+            build = cc if kind == "cc" else cc14
+            scale = inverse_scale(rule, size)
+            for midi_channel in channels:
+                target = address(rule, midi_channel + 1)
+                if target is None:
+                    continue
+                status = CONTROL_OFFSET + midi_channel
+                outputs[target] = build(status, rule["controller"], scale)
+                inputs[table_index(status, rule["controller"])] = target
+                if kind == "cc14":
+                    inputs[table_index(
+                        status, rule["controller"] + LSB_OFFSET)] = target
+        elif kind == "nrpn":
+            scale = inverse_scale(rule, 1 << 14)
+            for strip in range(rule.get("count", 1)):
+                target = address(rule, strip + 1)
+                if target is None:
+                    continue
+                number = rule["number"] + strip
+                outputs[target] = nrpn(channels[0], number, scale)
+                for midi_channel in channels:
+                    inputs[(CONTROL_OFFSET + midi_channel, number)] = target
+        elif kind == "note":
+            for strip in range(rule.get("count", 1)):
+                target = address(rule, strip + 1)
+                if target is None:
+                    continue
+                outputs[target] = note(channels[0], rule["note"] + strip,
+                                       rule["note_on"])
+                for midi_channel in channels:
+                    for status in (NOTE_ON_OFFSET, NOTE_OFF_OFFSET):
+                        inputs[table_index(status + midi_channel,
+                                           rule["note"] + strip)] = target
+    return outputs, inputs
+
+
+class MidiFeedback(threading.Thread):
+    """
+    Sends mixer state changes back to the surface as the MIDI messages that
+    would have made them, so motorized faders and button LEDs follow the
+    mixer. Messages are only sent when the MIDI value changes, at most once
+    per `interval` seconds per control (the latest value goes out when the
+    interval is up), and not for controls the surface itself moved within
+    the last `echo_window` seconds. Note and NRPN feedback goes out on the
+    MIDI channel the surface last used for that control.
+    """
+
+    def __init__(self, osc_controller, midiout, mapping=DEFAULT_MAPPING,
+                 interval=0.02, echo_window=0.25):
+        """
+        Initializer
+        :param osc_controller:
+        :param midiout: an open rtmidi.MidiOut, or anything with
+                        send_message(message)
+        :param mapping: see midimap
+        :param interval: minimum seconds between sends per control
+        :param echo_window: seconds after surface input during which the
+                            mixer's echo of it is not sent back
+        :return:
+        """
+        self.osc_controller = osc_controller
+        self.midiout = midiout
+        self.interval = interval
+        self.echo_window = echo_window
+        self.last_sent = {}
+        self.sent_at = {}
+        self.touched_at = {}
+        self.channels = {}
+        self.nrpn_numbers = {}
+        self.pending = {}
+        self.condition = threading.Condition()
+        self.active = False
+        self.sent = 0
+        self.skipped = 0
+        self.delayed = 0
+        self.echoes = 0
+        self.load(mapping)
+        super(MidiFeedback, self).__init__()
+        self.daemon = True
+
+    def load(self, mapping):
+        """
+        Swap in the reverse of a new mapping
+        :param mapping:
+        :return:
+        """
+        self.outputs, self.inputs = feedback_map(self.osc_controller, mapping)
+
+    def touched(self, message):
+        """
+        Record input from the surface, for echo suppression
+        :param message:
+        :return:
+        """
+        if len(message) < 3:
+            return
+        status, data1, data2 = message[0], message[1], message[2]
+        address = self.inputs.get((status << 7) | data1)
+        if address is None and status & 0xF0 == CONTROL_OFFSET:
+            address = self._nrpn_input(status, data1, data2)
+        if address is None:
+            return
+        with self.condition:
+            self.touched_at[address] = time.time()
+            self.channels[address] = status & 0x0F
+            # the surface now shows its own value, not the last one sent
+            self.last_sent.pop(address, None)
+            self.pending.pop(address, None)
+
+    def _nrpn_input(self, status, controller, value):
+        """
+        Follow NRPN selection on a channel
+        :return: the address of the NRPN a data entry message sets, or None
+        """
+        number_msb, number_lsb = self.nrpn_numbers.get(status, (None, None))
+        if controller == NRPN_MSB:
+            self.nrpn_numbers[status] = (value, number_lsb)
+        elif controller == NRPN_LSB:
+            self.nrpn_numbers[status] = (number_msb, value)
+        elif controller in (DATA_ENTRY_MSB, DATA_ENTRY_LSB) and \
+                number_msb is not None and number_lsb is not None:
+            return self.inputs.get((status, (number_msb << 7) | number_lsb))
+        return None
+
+    def changed(self, address, value):
+        """
+        MixerState listener
+        :param address:
+        :param value:
+        :return:
+        """
+        output = self.outputs.get(address)
+        if output is None or value is None:
+            return
+        now = time.time()
+        if now - self.touched_at.get(address, 0) < self.echo_window:
+            self.echoes += 1
+            return
+        with self.condition:
+            messages = output(value, self.channels.get(address))
+            if messages == self.last_sent.get(address):
+                self.pending.pop(address, None)
+                self.skipped += 1
+                return
+            if now - self.sent_at.get(address, 0) < self.interval:
+                if address not in self.pending:
+                    self.delayed += 1
+                self.pending[address] = messages
+                self.condition.notify()
+                return
+            self._send(address, messages, now)
+
+    def _send(self, address, messages, now):
+        for message in messages:
+            self.midiout.send_message(message)
+        self.last_sent[address] = messages
+        self.sent_at[address] = now
+        self.sent += 1
+
+    def refresh(self):
+        """
+        Send every known mapped value, e.g. after connecting
+        :return: number of controls sent
+        """
+        state = self.osc_controller.state
+        count = 0
+        with self.condition:
+            self.pending = {}
+            now = time.time()
+            for address, output in self.outputs.items():
+                value = state.get(address)
+                if value is not None:
+                    self._send(address,
+                               output(int(value), self.channels.get(address)),
+                               now)
+                    count += 1
+        return count
+
+    def run(self):
+        """
+        Thread run method: sends values held back by the rate limit
+        :return:
+        """
+        self.active = True
+        with self.condition:
+            while self.active:
+                if not self.pending:
+                    self.condition.wait()
+                    continue
+                now = time.time()
+                due = None
+                for address, messages in self.pending.items():
+                    ready_at = self.sent_at.get(address, 0) + self.interval
+                    if ready_at <= now:
+                        del self.pending[address]
+                        self._send(address, messages, now)
+                    elif due is None or ready_at < due:
+                        due = ready_at
+                if due is not None:
+                    self.condition.wait(due - now)
+
+    def stop(self):
+        with self.condition:
+            self.active = False
+            self.condition.notify()
+
+    def get_stats(self):
+        """
+        :return: dict of counters
+        """
+        return {
+            'sent': self.sent,
+            'skipped': self.skipped,
+            'delayed': self.delayed,
+            'echoes': self.echoes,
+            'pending': len(self.pending)}
@@ -0,0 +1,381 @@
+"""
+Declarative MIDI to OSC mapping.
+
+A mapping is a dict (usually loaded from a JSON file) with a list of rules:
+
+    {"message": "program", "action": "snapshot"}
+        a program change on the given MIDI channels loads that snapshot
+
+    {"message": "cc", "controller": 14, "strip": "dca", "parameter": "fader",
+     "in": [0, 127], "out": [-1, 1015]}
+        the controller sets the parameter of strip (MIDI channel + 1), with
+        the value scaled linearly from `in` to `out`
+
+    {"message": "note", "note": 24, "count": 16, "strip": "ch",
+     "parameter": "on", "note_on": 0, "note_off": 1}
+        notes note .. note + count - 1 set the parameter of strips
+        1 .. count to `note_on` on note on and to `note_off` on note off
+
+    {"message": "cc14", "controller": 7, "strip": "ch",
+     "parameter": "fader", "in": [0, 16383], "out": [-1, 1023]}
+        a 14-bit controller: the MSB on the controller number and the LSB on
+        controller + 32. The combined value is set when the LSB arrives,
+        so a pair is one update, never two half-updates.
+
+    {"message": "nrpn", "number": 256, "count": 16, "strip": "ch",
+     "parameter": "fader", "in": [0, 16383], "out": [-1, 1023]}
+        NRPNs number .. number + count - 1 (selected with CC 99/98, data on
+        CC 6/38) set the parameter of strips 1 .. count. The value is set
+        when the data LSB arrives.
+
+Every rule takes an optional "channels" list of MIDI channels (1-16,
+default all). cc rules take an optional "coalesce" (default true): whether
+only the latest value in a burst needs to be sent. Strip types and
+parameters are those of mixerstate.LAYOUT.
+"""
+import json
+
+CONTROL_OFFSET = 176
+PROGRAM_OFFSET = 192
+
+NOTE_ON_OFFSET = 144
+NOTE_OFF_OFFSET = 128
+
+# C0
+CHANNEL_MUTE = 24
+# C1
+DCA_MUTE = 48
+FX_MUTE = 52
+RTN_MUTE = 56
+# C3
+MUTE_GROUP = 60
+
+# dispatch table size: one entry per status byte and first data byte
+TABLE_SIZE = 256 << 7
+
+# 14-bit controllers: LSB controller = MSB controller + LSB_OFFSET
+LSB_OFFSET = 32
+NRPN_MSB = 99
+NRPN_LSB = 98
+DATA_ENTRY_MSB = 6
+DATA_ENTRY_LSB = 38
+
+# the mapping the bridge has always had
+DEFAULT_MAPPING = {
+    "rules": [
+        # a program change on ANY midi channel changes the snapshot
+        # the snapshot must exist on the device. we're not wizards, you
+        # know.
+        {"message": "program", "action": "snapshot"},
+        # 14: DCA volume change
+        {"message": "cc", "controller": 14, "strip": "dca",
+         "parameter": "fader", "in": [0, 127], "out": [-1, 1015]},
+        # 15: FxSend Volume Change
+        {"message": "cc", "controller": 15, "strip": "fxsend",
+         "parameter": "fader", "in": [0, 127], "out": [-1, 1015]},
+        # 16: Rtn Volume Change
+        {"message": "cc", "controller": 16, "strip": "rtn",
+         "parameter": "fader", "in": [0, 127], "out": [-1, 1015]},
+        # mutes: note on mutes, note off unmutes
+        {"message": "note", "note": MUTE_GROUP, "count": 4,
+         "strip": "mutegrp", "parameter": "on", "note_on": 1, "note_off": 0},
+        {"message": "note", "note": CHANNEL_MUTE, "count": 16,
+         "strip": "ch", "parameter": "on", "note_on": 0, "note_off": 1},
+        {"message": "note", "note": FX_MUTE, "count": 4,
+         "strip": "fxsend", "parameter": "on", "note_on": 0, "note_off": 1},
+        {"message": "note", "note": DCA_MUTE, "count": 4,
+         "strip": "dca", "parameter": "on", "note_on": 0, "note_off": 1},
+        {"message": "note", "note": RTN_MUTE, "count": 4,
+         "strip": "rtn", "parameter": "on", "note_on": 0, "note_off": 1},
+    ]
+}
+
+
+# keys each kind of rule must have
+REQUIRED_KEYS = {
+    "program": (),
+    "cc": ("controller", "strip", "parameter"),
+    "cc14": ("controller", "strip", "parameter"),
+    "nrpn": ("number", "strip", "parameter"),
+    "note": ("note", "strip", "parameter", "note_on", "note_off")}
+
+# integer keys, and their valid range
+INTEGER_KEYS = {
+    "controller": (0, 127),
+    "note": (0, 127),
+    "number": (0, (1 << 14) - 1),
+    "count": (1, 128)}
+
+
+class MappingError(Exception):
+    """
+    Raised for mappings that can't be compiled
+    """
+    pass
+
+
+def check_mapping(mapping):
+    """
+    Check that a mapping has the shape the compilers expect
+    :param mapping:
+    :return: the list of rules
+    :raises MappingError: naming the first bad rule
+    """
+    if not isinstance(mapping, dict) or \
+            not isinstance(mapping.get("rules", []), list):
+        raise MappingError("a mapping must be an object with a rules list")
+    rules = mapping.get("rules", [])
+    for rule in rules:
+        if not isinstance(rule, dict):
+            raise MappingError("a rule must be an object, not %r" % (rule,))
+        kind = rule.get("message")
+        if kind not in REQUIRED_KEYS:
+            raise MappingError("unknown message type in %r" % (rule,))
+        for key in REQUIRED_KEYS[kind]:
+            if key not in rule:
+                raise MappingError("missing %s in %r" % (key, rule))
+        for key, (low, high) in INTEGER_KEYS.items():
+            if key in rule and (not isinstance(rule[key], int) or
+                                not low <= rule[key] <= high):
+                raise MappingError("%s must be an integer %d-%d in %r" %
+                                   (key, low, high, rule))
+        for key in ("note", "number"):
+            highest = INTEGER_KEYS[key][1]
+            if key in rule and rule[key] + rule.get("count", 1) - 1 > highest:
+                raise MappingError("%s + count - 1 must be at most %d in %r" %
+                                   (key, highest, rule))
+        channels = rule.get("channels", [])
+        if not isinstance(channels, list) or \
+                not all(isinstance(channel, int) and 1 <= channel <= 16
+                        for channel in channels):
+            raise MappingError("channels must be a list of 1-16 in %r" %
+                               (rule,))
+        for key in ("in", "out"):
+            bounds = rule.get(key, [0, 0])
+            if not isinstance(bounds, list) or len(bounds) != 2 or \
+                    not all(isinstance(bound, (int, float))
+                            for bound in bounds):
+                raise MappingError("%s must be a [low, high] pair in %r" %
+                                   (key, rule))
+    return rules
+
+
+def table_index(status, data1):
+    """
+    Dispatch table index of a message
+    :param status: status byte
+    :param data1: first data byte
+    :return:
+    """
+    return (status << 7) | data1
+
+
+def load_mapping(path):
+    """
+    Read a mapping file
+    :param path:
+    :return: the mapping dict
+    """
+    try:
+        with open(path) as mapping:
+            return json.load(mapping)
+    except (IOError, OSError, ValueError), e:
+        raise MappingError("can't read mapping %s: %s" % (path, e))
+
+
+def scale_table(rule, size=128):
+    """
+    Lookup table of the output value for every MIDI value
+    :param rule: rule with optional "in" and "out" ranges
+    :param size: number of MIDI values; 128, or 16384 for 14-bit values
+    :return: tuple of `size` ints
+    """
+    in_low, in_high = rule.get("in", (0, size - 1))
+    out_low, out_high = rule.get("out", (0, size - 1))
+    if in_high == in_low:
+        raise MappingError("empty input range in %r" % (rule,))
+    step = float(out_high - out_low) / (in_high - in_low)
+    table = []
+    for value in range(size):
+        value = min(max(value, min(in_low, in_high)), max(in_low, in_high))
+        table.append(int(round(out_low + (value - in_low) * step)))
+    return tuple(table)
+
+
+class HighResolutionCC(object):
+    """
+    MSB/LSB pairing of one 14-bit controller on one MIDI channel
+    """
+
+    def __init__(self, setter, scale):
+        self.setter = setter
+        self.scale = scale
+        self.msb = None
+
+    def msb_action(self, message):
+        self.msb = message[2]
+
+    def lsb_action(self, message):
+        # an LSB without an MSB would be a half-update
+        if self.msb is not None:
+            self.setter(self.scale[(self.msb << 7) | message[2]])
+
+
+class NRPNState(object):
+    """
+    NRPN parameter selection and data entry on one MIDI channel
+    """
+
+    def __init__(self):
+        self.targets = {}
+        self.number_msb = None
+        self.number_lsb = None
+        self.data_msb = None
+
+    def number_msb_action(self, message):
+        self.number_msb = message[2]
+        self.data_msb = None
+
+    def number_lsb_action(self, message):
+        self.number_lsb = message[2]
+        self.data_msb = None
+
+    def data_msb_action(self, message):
+        self.data_msb = message[2]
+
+    def data_lsb_action(self, message):
+        if self.data_msb is None or self.number_msb is None or \
+                self.number_lsb is None:
+            return
+        target = self.targets.get((self.number_msb << 7) | self.number_lsb)
+        if target is not None:
+            setter, scale = target
+            setter(scale[(self.data_msb << 7) | message[2]])
+
+
+def compile_table(osc_controller, mapping=DEFAULT_MAPPING):
+    """
+    Compile a mapping into a flat dispatch table, indexed by
+    table_index(status, data1). Each entry is None or an action(message)
+    bound to the mixer element it drives. Actions that only need the latest
+    value of a burst have a true `coalesce` attribute; 14-bit and NRPN
+    actions don't, since they only make sense in order.
+    :param osc_controller: a controller with the MixerCommands methods
+    :param mapping:
+    :return: list of TABLE_SIZE entries
+    :raises MappingError: for a mapping that can't be compiled
+    """
+    rules = check_mapping(mapping)
+    try:
+        return _compile_table(osc_controller, rules)
+    except (KeyError, TypeError, ValueError, AttributeError), e:
+        raise MappingError("can't compile mapping: %r" % (e,))
+
+
+def _compile_table(osc_controller, rules):
+    table = [None] * TABLE_SIZE
+    numbers = dict((strip, strip_numbers) for strip, strip_numbers, prefix,
+                   parameters in osc_controller.state.layout)
+
+    def element(rule, strip):
+        """
+        The element of the rule's parameter on the given strip (counting
+        from 1), or None if the mixer has no such strip
+        """
+        try:
+            number = numbers[rule["strip"]][strip - 1]
+            return osc_controller.element(rule["strip"], number,
+                                          rule["parameter"])
+        except KeyError, e:
+            raise MappingError("unknown parameter %s in %r" % (e, rule))
+        except IndexError:
+            return None
+
+    def snapshot(message):
+        osc_controller.snapshot(message[1])
+
+    def scaled(setter, scale, coalesce):
+        def action(message):
+            setter(scale[message[2]])
+        action.coalesce = coalesce
+        return action
+
+    def fixed(setter, value):
+        def action(message):
+            setter(value)
+        return action
+
+    nrpn = {}
+
+    for rule in rules:
+        kind = rule.get("message")
+        channels = [channel - 1 for channel in
+                    rule.get("channels", range(1, 17))]
+        if kind == "program":
+            if rule.get("action", "snapshot") != "snapshot":
+                raise MappingError("unknown action in %r" % (rule,))
+            for midi_channel in channels:
+                for program in range(128):
+                    table[table_index(PROGRAM_OFFSET + midi_channel,
+                                      program)] = snapshot
+        elif kind == "cc":
+            scale = scale_table(rule)
+            coalesce = rule.get("coalesce", True)
+            for midi_channel in channels:
+                target = element(rule, midi_channel + 1)
+                if target is None:
+                    continue
+                table[table_index(CONTROL_OFFSET + midi_channel,
+                                  rule["controller"])] = \
+                    scaled(target.set, scale, coalesce)
+        elif kind == "cc14":
+            scale = scale_table(rule, 1 << 14)
+            controller = rule["controller"]
+            if not 0 <= controller < LSB_OFFSET:
+                raise MappingError("14-bit controller must be 0-31 in %r" %
+                                   (rule,))
+            for midi_channel in channels:
+                target = element(rule, midi_channel + 1)
+                if target is None:
+                    continue
+                pair = HighResolutionCC(target.set, scale)
+                status = CONTROL_OFFSET + midi_channel
+                table[table_index(status, controller)] = pair.msb_action
+                table[table_index(status, controller + LSB_OFFSET)] = \
+                    pair.lsb_action
+        elif kind == "nrpn":
+            scale = scale_table(rule, 1 << 14)
+            for midi_channel in channels:
+                state = nrpn.get(midi_channel)
+                if state is None:
+                    state = nrpn[midi_channel] = NRPNState()
+                    status = CONTROL_OFFSET + midi_channel
+                    table[table_index(status, NRPN_MSB)] = \
+                        state.number_msb_action
+                    table[table_index(status, NRPN_LSB)] = \
+                        state.number_lsb_action
+                    table[table_index(status, DATA_ENTRY_MSB)] = \
+                        state.data_msb_action
+                    table[table_index(status, DATA_ENTRY_LSB)] = \
+                        state.data_lsb_action
+                for strip in range(rule.get("count", 1)):
+                    target = element(rule, strip + 1)
+                    if target is not None:
+                        state.targets[rule["number"] + strip] = \
+                            (target.set, scale)
+        elif kind == "note":
+            for strip in range(rule.get("count", 1)):
+                target = element(rule, strip + 1)
+                if target is None:
+                    continue
+                note = rule["note"] + strip
+                on = fixed(target.set, rule["note_on"])
+                off = fixed(target.set, rule["note_off"])
+                for midi_channel in channels:
+                    table[table_index(NOTE_ON_OFFSET + midi_channel,
+                                      note)] = on
+                    table[table_index(NOTE_OFF_OFFSET + midi_channel,
+                                      note)] = off
+        else:
+            raise MappingError("unknown message type in %r" % (rule,))
+    return table
@@ -1,6 +1,86 @@
 import threading
 import itertools
+import os
+import sys
+import time
+from collections import deque
 import rtmidi
+from midifeedback import MidiFeedback
+from midimap import (CONTROL_OFFSET, PROGRAM_OFFSET, NOTE_ON_OFFSET,
+                     NOTE_OFF_OFFSET, CHANNEL_MUTE, DCA_MUTE, FX_MUTE,
+                     RTN_MUTE, MUTE_GROUP, TABLE_SIZE, DEFAULT_MAPPING,
+                     MappingError, table_index, compile_table, load_mapping)
+
+# the midimap names are re-exported: midireceiver was their home before the
+# mapping moved out, and scripts still import them from here
+__all__ = ['MidiInputHandler', 'MidiReceiver', 'split_seq',
+           'CONTROL_OFFSET', 'PROGRAM_OFFSET', 'NOTE_ON_OFFSET',
+           'NOTE_OFF_OFFSET', 'CHANNEL_MUTE', 'DCA_MUTE', 'FX_MUTE',
+           'RTN_MUTE', 'MUTE_GROUP', 'TABLE_SIZE', 'DEFAULT_MAPPING',
+           'MappingError', 'table_index', 'compile_table', 'load_mapping']
+
+# CLOCK_MONOTONIC differs per platform
+CLOCK_MONOTONIC_IDS = {'linux': 1, 'darwin': 6}
+
+
+def _monotonic_clock():
+    """
+    Python 2 has no monotonic clock in the standard library: read
+    CLOCK_MONOTONIC with libc's clock_gettime, so an NTP step doesn't clump
+    or re-anchor a replay
+    :return: clock function, or None if clock_gettime isn't usable
+    """
+    platform = sys.platform.rstrip('0123456789')
+    if platform not in CLOCK_MONOTONIC_IDS:
+        return None
+    try:
+        import ctypes
+        import ctypes.util
+
+        class Timespec(ctypes.Structure):
+            _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        clock_gettime = libc.clock_gettime
+    except (ImportError, OSError, AttributeError):
+        return None
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(Timespec)]
+    clock_id = CLOCK_MONOTONIC_IDS[platform]
+
+    def monotonic():
+        """
+        Seconds since an arbitrary point, never stepped
+        """
+        # a fresh struct per call: drain() and the rtmidi callback run on
+        # different threads
+        now = Timespec()
+        if clock_gettime(clock_id, ctypes.byref(now)) != 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        return now.tv_sec + now.tv_nsec * 1e-9
+
+    try:
+        monotonic()
+    except OSError:
+        return None
+    return monotonic
+
+
+try:
+    from time import monotonic as clock
+except ImportError:
+    clock = _monotonic_clock() or time.time
+
+
+def _complete(message):
+    """
+    Whether a message has the bytes its table action reads: program changes
+    are 2 bytes; every mapped action of any other message reads message[2]
+    """
+    if len(message) >= 3:
+        return True
+    return len(message) == 2 and message[0] & 0xF0 == PROGRAM_OFFSET
+
 
 def split_seq(iterable, size):
     """Little hack to split iterables up"""
@@ -10,132 +90,343 @@ def split_seq(iterable, size):
         yield item
         item = list(itertools.islice(it, size))
 
-CONTROL_OFFSET = 176
-PROGRAM_OFFSET = 192
 
-NOTE_ON_OFFSET = 144
-NOTE_OFF_OFFSET = 128
+class MidiInputHandler:
+    """
+    Midi Input Handler. The rtmidi callback only timestamps and queues each
+    message; drain() parses them on the worker thread, so slow sends never
+    hold up rtmidi.
 
-# C0
-CHANNEL_MUTE = 24
-# C1
-DCA_MUTE = 48
-FX_MUTE = 52
-RTN_MUTE = 56
-# C3
-MUTE_GROUP = 60
+    With a schedule latency, messages are not handled as they arrive but
+    replayed at their rtmidi deltatime spacing, `latency` seconds behind
+    the source, so bursty delivery doesn't clump timed automation. If a
+    message arrives too late for its slot, the schedule is re-anchored to
+    it.
+    """
 
+    def __init__(self, osc_controller, queue_size=4096, mapping_path=None,
+                 latency=None):
+        """
+        Initializer
+        :param osc_controller:
+        :param queue_size: messages to hold before dropping new ones
+        :param mapping_path: JSON mapping file (see midimap), or None for
+                             the default mapping
+        :param latency: schedule buffer in seconds, or None to handle
+                        messages as soon as possible
+        :return:
+        """
+        self.osc_controller = osc_controller
+        self.mapping_path = mapping_path
+        self.mapping_mtime = None
+        self.mapping_error = None
+        self.compiled = None
+        self.mapping = None
+        self.feedback = None
+        if mapping_path is None:
+            self.load(DEFAULT_MAPPING)
+        else:
+            self.reload()
+            if self.mapping_error is not None:
+                raise MappingError(self.mapping_error)
+        # deque appends and pops are atomic, no lock needed
+        self.queue = deque()
+        self.queue_size = queue_size
+        self.latency = latency
+        self.source_time = 0.0
+        self.offset = None
+        self.reanchored = 0
+        self.wakeup = threading.Event()
+        self.received = 0
+        self.dropped = 0
+        self.handled = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self.total_latency = 0.0
+        self.total_square_latency = 0.0
 
-class MidiInputHandler:
-    """Midi Input Handler"""
+    def load(self, mapping):
+        """
+        Compile a mapping and swap it in. The swap is a single assignment,
+        so a batch being drained finishes with the table it started with
+        and nothing queued is lost.
+        :param mapping: mapping dict, see midimap
+        :return:
+        """
+        table = compile_table(self.osc_controller, mapping)
+        coalescable = frozenset(
+            index for index, action in enumerate(table)
+            if getattr(action, 'coalesce', False))
+        self.compiled = (table, coalescable)
+        self.mapping = mapping
 
-    def __init__(self, osc_controller):
-        self.osc_controller = osc_controller
+    def reload(self):
+        """
+        Reload the mapping file if it changed. A mapping that fails to load
+        keeps the current one in place and is reported in mapping_error; it
+        is read again on the next call, in case it was caught half-written.
+        :return: True if a new mapping was swapped in
+        """
+        if self.mapping_path is None:
+            return False
+        try:
+            mtime = os.stat(self.mapping_path).st_mtime
+        except OSError, e:
+            self.mapping_error = str(e)
+            return False
+        if mtime == self.mapping_mtime:
+            return False
+        try:
+            self.load(load_mapping(self.mapping_path))
+        except MappingError, e:
+            self.mapping_error = str(e)
+            return False
+        self.mapping_mtime = mtime
+        self.mapping_error = None
+        return True
 
     def __call__(self, event, data=None):
         message, deltatime = event
-        self.parse_midi(message)
+        if self.latency is not None:
+            # before the drop check: a dropped message's delta still
+            # spaces the messages after it
+            self.source_time += deltatime
+        if len(self.queue) >= self.queue_size:
+            self.dropped += 1
+            return
+        now = clock()
+        due = now
+        if self.latency is not None:
+            if self.offset is not None:
+                due = self.source_time + self.offset + self.latency
+            if self.offset is None or due < now or \
+                    due > now + 2 * self.latency:
+                # first message, a message late for its slot, or clock
+                # drift: start the schedule over from this message
+                if self.offset is not None:
+                    self.reanchored += 1
+                self.offset = now - self.source_time
+                due = now + self.latency
+        self.queue.append((due, message))
+        self.received += 1
+        self.wakeup.set()
+
+    def drain(self, batch=64):
+        """
+        Parse up to `batch` queued messages that are due. Control changes
+        superseded by a later one for the same controller in the batch are
+        skipped.
+        :param batch:
+        :return: number of messages taken off the queue
+        """
+        queue = self.queue
+        messages = []
+        now = clock()
+        while queue and len(messages) < batch and queue[0][0] <= now:
+            messages.append(queue.popleft())
+        if not messages:
+            return 0
+
+        table, coalescable = self.compiled
+        feedback = self.feedback
+        last = {}
+        for position, (stamp, message) in enumerate(messages):
+            # a truncated message must not replace a valid one
+            if _complete(message):
+                index = (message[0] << 7) | message[1]
+                if index in coalescable:
+                    last[index] = position
+
+        for position, (stamp, message) in enumerate(messages):
+            if feedback is not None:
+                feedback.touched(message)
+            if _complete(message):
+                index = (message[0] << 7) | message[1]
+                if last.get(index, position) != position:
+                    self.coalesced += 1
+                    continue
+            try:
+                self.parse_midi(message, table)
+            except Exception, e:
+                # e.g. the mixer is unreachable; losing this one message is
+                # better than stopping the worker, and with it all MIDI
+                self.errors += 1
+                self.last_error = "%s: %s" % (e.__class__.__name__, e)
+            latency = clock() - stamp
+            self.last_latency = latency
+            self.total_latency += latency
+            self.total_square_latency += latency * latency
+            if latency > self.max_latency:
+                self.max_latency = latency
+            self.handled += 1
+        return len(messages)
+
+    def wait_time(self):
+        """
+        :return: seconds until the next queued message is due, or None if
+                 the queue is empty: wait until woken, since a timed wait
+                 polls on Python 2 and would delay the next message
+        """
+        queue = self.queue
+        if not queue:
+            return None
+        try:
+            return max(queue[0][0] - clock(), 0.0)
+        except IndexError:
+            return 0.0
+
+    def get_stats(self):
+        """
+        :return: dict with the queue depth, message counters, and the
+                 latency from arrival to send in seconds. When scheduling,
+                 latency is measured from the scheduled time instead.
+                 Jitter is the standard deviation of the latency.
+        """
+        return {
+            'depth': len(self.queue),
+            'received': self.received,
+            'dropped': self.dropped,
+            'handled': self.handled,
+            'coalesced': self.coalesced,
+            'errors': self.errors,
+            'last_error': self.last_error,
+            'last_latency': self.last_latency,
+            'max_latency': self.max_latency,
+            'mean_latency': self.total_latency / self.handled
+            if self.handled else 0.0,
+            'jitter': self.jitter(),
+            'reanchored': self.reanchored}
 
-    def parse_midi(self, message):
+    def jitter(self):
         """
-        Parse the midi message
+        :return: standard deviation of the latency, in seconds
+        """
+        if not self.handled:
+            return 0.0
+        mean = self.total_latency / self.handled
+        variance = self.total_square_latency / self.handled - mean * mean
+        return max(variance, 0.0) ** 0.5
+
+    def parse_midi(self, message, table=None):
+        """
+        Parse the midi message: one table lookup, one call
         :param message:
+        :param table: dispatch table; defaults to the current one
         :return:
         """
-        m_type = message[0]
-        # a program change on ANY midi channel changes the snapshot
-        # the snapshot must exist on the device. we're not wizards, you
-        # know.
-
-        if m_type in range(PROGRAM_OFFSET, PROGRAM_OFFSET + 16):
-            self.osc_controller.snapshot(message[1])
-
-        if m_type in range(CONTROL_OFFSET, CONTROL_OFFSET + 16):
-            if len(message) == 3:
-                channel = (message[0] - CONTROL_OFFSET) + 1
-                controller = message[1]
-                value = message[2]
-                # 14: DCA volume change
-                if controller == 14:
-                    value = (value * 8) - 1
-                    self.osc_controller.set_dca_fader(channel, value)
-                # 15: FxSend Volume Change
-                if controller == 15:
-                    value = (value * 8) - 1
-                    self.osc_controller.set_fxsend_fader(channel, value)
-                # 17: Rtn Volume Change
-                if controller == 16:
-                    value = (value * 8) - 1
-                    self.osc_controller.set_return_fader(channel, value)
-        # mute on
-        if m_type in range(NOTE_ON_OFFSET, NOTE_ON_OFFSET + 16):
-            if message[1] in range(MUTE_GROUP, MUTE_GROUP + 4):
-                channel = message[1] - (MUTE_GROUP - 1)
-                self.osc_controller.set_mute_group_mute(channel, 0)
-
-            if message[1] in range(CHANNEL_MUTE, CHANNEL_MUTE + 16):
-                channel = message[1] - (CHANNEL_MUTE - 1)
-                self.osc_controller.set_channel_mute(channel, 1)
-
-            if message[1] in range(FX_MUTE, FX_MUTE + 4):
-                channel = message[1] - (FX_MUTE - 1)
-                self.osc_controller.set_fxsend_mute(channel, 1)
-
-            if message[1] in range(DCA_MUTE, DCA_MUTE + 4):
-                channel = message[1] - (DCA_MUTE - 1)
-                self.osc_controller.set_dca_mute(channel, 1)
-
-            if message[1] in range(RTN_MUTE, RTN_MUTE + 4):
-                channel = message[1] - (RTN_MUTE - 1)
-                self.osc_controller.set_return_mute(channel, 1)
-        # mute off
-        if m_type in range(NOTE_OFF_OFFSET, NOTE_OFF_OFFSET + 16):
-            if message[1] in range(MUTE_GROUP, MUTE_GROUP + 4):
-                channel = message[1] - (MUTE_GROUP - 1)
-                self.osc_controller.set_mute_group_mute(channel, 1)
-
-            if message[1] in range(CHANNEL_MUTE, CHANNEL_MUTE + 16):
-                channel = message[1] - (CHANNEL_MUTE - 1)
-                self.osc_controller.set_channel_mute(channel, 0)
-
-            if message[1] in range(FX_MUTE, FX_MUTE + 4):
-                channel = message[1] - (FX_MUTE - 1)
-                self.osc_controller.set_fxsend_mute(channel, 0)
-
-            if message[1] in range(DCA_MUTE, DCA_MUTE + 4):
-                channel = message[1] - (DCA_MUTE - 1)
-                self.osc_controller.set_dca_mute(channel, 0)
-
-            if message[1] in range(RTN_MUTE, RTN_MUTE + 4):
-                channel = message[1] - (RTN_MUTE - 1)
-                self.osc_controller.set_return_mute(channel, 0)
+        if not _complete(message):
+            return
+        if table is None:
+            table = self.compiled[0]
+        action = table[(message[0] << 7) | message[1]]
+        if action is not None:
+            action(message)
+
 
 class MidiReceiver(threading.Thread):
     """
     Threaded, queue enabled midi reciever
     """
 
-    def __init__(self, osc_controller, driver_name):
+    def __init__(self, osc_controller, driver_name, mapping_path=None,
+                 reload_interval=1.0, feedback=False, latency=None):
         """
         Init Method
+        :param osc_controller:
+        :param driver_name:
+        :param mapping_path: JSON mapping file, reloaded when it changes
+        :param reload_interval: seconds between checks of the mapping file
+        :param feedback: also open a virtual output port mirroring mixer
+                         changes back to the surface
+        :param latency: replay MIDI at its original timing, this many
+                        seconds behind; None handles it as it arrives
         """
         self.midi_driver_name = driver_name
+        self.reload_interval = reload_interval
         midiin = rtmidi.MidiIn()
         self.rtmidiin = midiin.open_virtual_port(driver_name)
-        self.rtmidiin.set_callback(MidiInputHandler(osc_controller))
+        self.handler = MidiInputHandler(osc_controller,
+                                        mapping_path=mapping_path,
+                                        latency=latency)
+        self.rtmidiin.set_callback(self.handler)
+        self.osc_controller = osc_controller
+        self.feedback = None
+        if feedback:
+            midiout = rtmidi.MidiOut()
+            midiout.open_virtual_port(driver_name)
+            self.feedback = MidiFeedback(osc_controller, midiout,
+                                         self.handler.mapping)
+            self.handler.feedback = self.feedback
+            osc_controller.state.add_listener(self.feedback.changed)
         self.active = False
         super(MidiReceiver, self).__init__()
 
     def run(self):
         """
-        Run Method
+        Run Method: drains the handler's queue until stopped
         """
         print "Midi Driver", self.midi_driver_name, "is now starting..."
         self.active = True
+        handler = self.handler
+        if self.feedback is not None:
+            self.feedback.start()
+            self.feedback.refresh()
+        if handler.mapping_path is not None:
+            watcher = threading.Thread(target=self.watch_mapping)
+            watcher.daemon = True
+            watcher.start()
+        while self.active:
+            if not handler.drain():
+                # cleared before wait_time() looks at the queue and before
+                # active is checked again, so a message queued or a stop()
+                # in between still wakes us
+                handler.wakeup.clear()
+                if self.active:
+                    handler.wakeup.wait(handler.wait_time())
+
+    def watch_mapping(self):
+        """
+        Mapping watcher thread: reloads the mapping file when it changes,
+        checking every reload_interval seconds
+        """
+        handler = self.handler
+        reported = None
+        while self.active:
+            time.sleep(self.reload_interval)
+            if not self.active:
+                break
+            if handler.reload():
+                print "Midi Driver", self.midi_driver_name, \
+                    "reloaded", handler.mapping_path
+                if self.feedback is not None:
+                    try:
+                        self.feedback.load(handler.mapping)
+                    except MappingError, e:
+                        print "Midi Driver", self.midi_driver_name, e
+            elif handler.mapping_error != reported:
+                # a bad file is retried every interval; say so once
+                if handler.mapping_error is not None:
+                    print "Midi Driver", self.midi_driver_name, \
+                        handler.mapping_error
+            reported = handler.mapping_error
+
     def stop(self):
         """
         Stop the listener
         """
         print "Midi Driver", self.midi_driver_name, "is shutting down..."
         self.active = False
+        self.handler.wakeup.set()
+        if self.feedback is not None:
+            self.osc_controller.state.remove_listener(self.feedback.changed)
+            self.feedback.stop()
+
+    def get_stats(self):
+        """
+        :return: see MidiInputHandler.get_stats
+        """
+        return self.handler.get_stats()
 
@@ -0,0 +1,59 @@
+"""
+Cache of previously discovered mixers
+"""
+import json
+import os
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".x18_controller.json")
+
+
+class MixerCache(object):
+    """
+    The last known mixers (address, name, model, version) in a small JSON
+    file, most recently connected first, so startup can probe them before
+    scanning the network.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, size=8):
+        """
+        Initializer
+        :param path: cache file
+        :param size: maximum number of mixers to remember
+        :return:
+        """
+        self.path = path
+        self.size = size
+
+    def load(self):
+        """
+        :return: list of info dicts; empty if the cache is missing or
+                 unreadable
+        """
+        try:
+            with open(self.path) as cache:
+                mixers = json.load(cache)
+        except (IOError, OSError, ValueError):
+            return []
+        if not isinstance(mixers, list):
+            return []
+        return [mixer for mixer in mixers
+                if isinstance(mixer, dict) and mixer.get('address')]
+
+    def remember(self, mixer):
+        """
+        Move a mixer to the front of the cache
+        :param mixer: info dict with 'address', 'name', 'model', 'version'
+        :return:
+        """
+        entry = dict((key, mixer.get(key))
+                     for key in ('address', 'name', 'model', 'version'))
+        mixers = [known for known in self.load()
+                  if known['address'] != entry['address']]
+        mixers.insert(0, entry)
+        temp = self.path + ".tmp"
+        try:
+            with open(temp, "w") as cache:
+                json.dump(mixers[:self.size], cache, indent=2)
+            os.rename(temp, self.path)
+        except (IOError, OSError):
+            pass
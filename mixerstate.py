@@ -0,0 +1,184 @@
+"""
+Array-backed mixer state store
+"""
+import array
+import threading
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+UNKNOWN = float('nan')
+
+FADER_ON_PAN = (
+    ('fader', 'mix/fader'),
+    ('on', 'mix/on'),
+    ('pan', 'mix/pan'))
+
+FADER_ON = (
+    ('fader', 'mix/fader'),
+    ('on', 'mix/on'))
+
+# strip type, numbers, address prefix, parameters (name, address suffix)
+LAYOUT = (
+    ('ch', ['%02d' % ch for ch in range(1, 17)], '/ch/', FADER_ON_PAN),
+    ('rtn', ['1', '2', '3', '4', 'aux'], '/rtn/', FADER_ON_PAN),
+    ('bus', [str(bus) for bus in range(1, 7)], '/bus/', FADER_ON_PAN),
+    ('fxsend', [str(fx) for fx in range(1, 5)], '/fxsend/', FADER_ON),
+    ('dca', [str(dca) for dca in range(1, 5)], '/dca/',
+     (('fader', 'fader'), ('on', 'on'))),
+    ('mutegrp', [str(grp) for grp in range(1, 5)], '/config/mute/',
+     (('on', ''),)),
+)
+
+
+def _new_array(size, value):
+    if numpy is not None:
+        return numpy.full(size, value, dtype=numpy.float64)
+    return array.array('d', [value] * size)
+
+
+class MixerState(object):
+    """
+    Mixer parameter values, stored per strip type and parameter in one
+    contiguous float array (NumPy when available) with a slot per strip.
+    Unknown values are NaN. Each value has a timestamp array alongside.
+    """
+
+    def __init__(self, layout=LAYOUT):
+        """
+        Initializer
+        :param layout: strip types, see LAYOUT
+        :return:
+        """
+        self.layout = layout
+        # replaced, never changed in place: reported() runs on the server's
+        # worker threads while listeners come and go
+        self.listeners = []
+        self.listeners_lock = threading.Lock()
+        self.values = {}
+        self.times = {}
+        self.index = {}
+        self.addresses = {}
+        for strip, numbers, prefix, parameters in layout:
+            for parameter, suffix in parameters:
+                key = (strip, parameter)
+                self.values[key] = _new_array(len(numbers), UNKNOWN)
+                self.times[key] = _new_array(len(numbers), 0.0)
+                for slot, number in enumerate(numbers):
+                    address = prefix + number
+                    if suffix:
+                        address += '/' + suffix
+                    self.index[address] = (key, slot)
+                    self.addresses[(strip, number, parameter)] = address
+
+    def add_listener(self, listener):
+        """
+        Call listener(address, value) whenever the mixer reports a value
+        :param listener:
+        :return:
+        """
+        with self.listeners_lock:
+            self.listeners = self.listeners + [listener]
+
+    def remove_listener(self, listener):
+        with self.listeners_lock:
+            listeners = list(self.listeners)
+            listeners.remove(listener)
+            self.listeners = listeners
+
+    def reported(self, address, value):
+        """
+        Called by the elements after recording a value reported by the mixer
+        :param address:
+        :param value:
+        :return:
+        """
+        for listener in self.listeners:
+            listener(address, value)
+
+    def address(self, strip, number, parameter):
+        """
+        OSC address of a parameter
+        :param strip: strip type, e.g. 'ch'
+        :param number: strip number as used in the address, e.g. '01'
+        :param parameter: 'fader', 'on' or 'pan'
+        :return:
+        """
+        return self.addresses[(strip, str(number), parameter)]
+
+    def bind(self, address):
+        """
+        Storage of a parameter
+        :param address: OSC address
+        :return: (values array, times array, slot)
+        """
+        key, slot = self.index[address]
+        return self.values[key], self.times[key], slot
+
+    def get(self, address):
+        """
+        Current value of a parameter
+        :param address: OSC address
+        :return: the value, or None if unknown
+        """
+        key, slot = self.index[address]
+        value = self.values[key][slot]
+        if value != value:
+            return None
+        return value
+
+    def snapshot(self):
+        """
+        Copy of all values
+        :return: {(strip, parameter): values}
+        """
+        out = {}
+        for key, values in self.values.items():
+            if numpy is not None:
+                out[key] = values.copy()
+            else:
+                out[key] = array.array('d', values)
+        return out
+
+    def diff(self, snapshot):
+        """
+        Parameters whose value changed since the given snapshot
+        :param snapshot: see snapshot()
+        :return: list of (address, old value, new value); unknown is None
+        """
+        changes = []
+        for strip, numbers, prefix, parameters in self.layout:
+            for parameter, suffix in parameters:
+                key = (strip, parameter)
+                old = snapshot[key]
+                new = self.values[key]
+                if numpy is not None:
+                    same = (old == new) | (numpy.isnan(old) & numpy.isnan(new))
+                    slots = numpy.flatnonzero(~same)
+                else:
+                    slots = [slot for slot in range(len(new))
+                             if old[slot] != new[slot] and
+                             (old[slot] == old[slot] or new[slot] == new[slot])]
+                for slot in slots:
+                    address = self.addresses[(strip, numbers[slot], parameter)]
+                    changes.append((address, _known(old[slot]),
+                                    _known(new[slot])))
+        return changes
+
+    def items(self):
+        """
+        Iterates over every parameter
+        :return: (strip, number, parameter, address) tuples
+        """
+        for strip, numbers, prefix, parameters in self.layout:
+            for number in numbers:
+                for parameter, suffix in parameters:
+                    yield (strip, number, parameter,
+                           self.addresses[(strip, number, parameter)])
+
+
+def _known(value):
+    if value != value:
+        return None
+    return float(value)
@@ -0,0 +1,308 @@
+"""
+OSC benchmarks.
+
+Usage:
+    python oscbench.py dispatch [messages]
+    python oscbench.py codec [messages] [--save file] [--baseline file]
+                             [--tolerance fraction]
+
+codec compares against a baseline saved with --save, and exits with 1 if
+any rate fell by more than the tolerance (default 0.1). Rates are compared
+relative to a reference workload run in the same process, which takes out
+most of the machine's speed and load, but a baseline is still only
+reliable on the machine that saved it: save your own before changing the
+codec.
+
+codec reports no allocation figures. Python 2 has no allocation counter in
+a release build: tracemalloc is Python 3 only, and the collector's counts
+only see containers still alive after a call, not the strings and slices
+the codec allocates and frees.
+"""
+import json
+import struct
+import sys
+import time
+import OSC
+
+
+def _noop_handler(addr, tags, data, client_address):
+    pass
+
+
+class _Dispatcher(OSC.OSCRequestHandler):
+    """
+    Request handler that only dispatches, without a request to serve.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.client_address = ("127.0.0.1", 0)
+
+
+def _linear_dispatch(server, pattern):
+    """
+    The address matching OSCRequestHandler.dispatchMessage used to do:
+    compile the pattern, then try it against every registered address.
+    :param server:
+    :param pattern:
+    :return:
+    """
+    expr = OSC.getRegEx(pattern)
+    matched = []
+    for addr in server.callbacks.keys():
+        match = expr.match(addr)
+        if match and (match.end() == len(addr)):
+            matched.append(addr)
+    return matched
+
+
+def _per_message(function, patterns, messages):
+    """
+    Average wall time per call, in microseconds, after one warm-up
+    call per pattern.
+    :param function:
+    :param patterns:
+    :param messages:
+    :return:
+    """
+    for pattern in patterns:
+        function(pattern)
+    count = len(patterns)
+    start = time.time()
+    for i in xrange(messages):
+        function(patterns[i % count])
+    return (time.time() - start) / messages * 1e6
+
+
+def bench_dispatch(sizes=(100, 1000, 10000), messages=20000):
+    """
+    Per-message dispatch cost as the number of registered handlers grows.
+    :param sizes: handler counts to measure
+    :param messages: messages dispatched per measurement
+    :return: list of result dicts
+    """
+    results = []
+    for size in sizes:
+        server = OSC.OSCServer(("127.0.0.1", 0))
+        for n in xrange(size):
+            server.addMsgHandler("/bench/%05d/mix/fader" % n, _noop_handler)
+
+        handler = _Dispatcher(server)
+
+        exact = ["/bench/%05d/mix/fader" % n for n in xrange(0, size, 7)]
+        wildcard = ["/bench/%05d/mix/*" % n for n in xrange(0, size, 7)]
+
+        def dispatch(pattern):
+            handler.dispatchMessage(pattern, "i", [0])
+
+        def uncached(pattern):
+            # every pattern repeats, so without this only the first call
+            # of each exercises the matcher itself
+            server.addressTree.cache.clear()
+            handler.dispatchMessage(pattern, "i", [0])
+
+        def linear(pattern):
+            _linear_dispatch(server, pattern)
+
+        results.append({
+            'handlers': size,
+            'exact_us': _per_message(dispatch, exact, messages),
+            'wildcard_us': _per_message(dispatch, wildcard, messages),
+            'uncached_us': _per_message(uncached, wildcard, messages),
+            'linear_us': _per_message(linear, exact, max(messages / size, 10)),
+        })
+        server.close()
+    return results
+
+
+def _message(address, *arguments):
+    message = OSC.OSCMessage(address)
+    for argument in arguments:
+        message.append(argument)
+    return message
+
+
+def _meter_blob_message():
+    message = OSC.OSCMessage("/meters/1")
+    message.append(struct.pack('<i40h', 40, *range(-40 * 256, 0, 256)), 'b')
+    return message
+
+
+def _nested_bundle():
+    inner = OSC.OSCBundle()
+    for ch in range(1, 5):
+        inner.append(_message("/ch/%02d/mix/fader" % ch, 0.5))
+    bundle = OSC.OSCBundle()
+    bundle.append(_message("/-snap/load", 3))
+    bundle.append(inner)
+    bundle.append(_message("/ch/01/mix/on", 0))
+    return bundle
+
+
+# X18 traffic shapes: name -> function building the message
+CODEC_CASES = (
+    ('int_set', lambda: _message("/ch/01/mix/on", 1)),
+    ('float_echo', lambda: _message("/ch/01/mix/fader", 0.75)),
+    ('xinfo', lambda: _message("/xinfo", "192.168.1.2", "XR18-5E-A1-9C",
+                               "XR18", "1.17")),
+    ('meter_blob', _meter_blob_message),
+    ('nested_bundle', _nested_bundle),
+)
+
+
+def _rate(function, messages, repeat=5):
+    """
+    Calls per second, best of `repeat` runs
+    """
+    function()
+    best = None
+    for run in xrange(repeat):
+        start = time.time()
+        for i in xrange(messages):
+            function()
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return messages / best
+
+
+_REFERENCE_HEADER = "/ch/01/mix/fader\0\0\0\0,f\0\0"
+
+
+def _reference():
+    """
+    Fixed work the size of a small message's encode and decode, using none
+    of the code under test: the yardstick rates are compared against
+    """
+    binary = "".join((_REFERENCE_HEADER, struct.pack(">f", 0.75)))
+    return binary[:binary.find("\0")], struct.unpack(">f", binary[-4:])[0]
+
+
+def bench_codec(messages=20000):
+    """
+    Encode (building the message and getBinary) and decode (decodeOSC)
+    rates for each of CODEC_CASES, also as a multiple of the rate of
+    _reference() in the same run.
+    :param messages: calls per measurement
+    :return: list of result dicts
+    """
+    reference_rate = _rate(_reference, messages)
+    results = []
+    for name, build in CODEC_CASES:
+        binary = build().getBinary()
+
+        def encode():
+            return build().getBinary()
+
+        def decode():
+            return OSC.decodeOSC(binary)
+
+        encode_rate = _rate(encode, messages)
+        decode_rate = _rate(decode, messages)
+        results.append({
+            'case': name,
+            'size': len(binary),
+            'encode_msgs': encode_rate,
+            'encode_bytes': encode_rate * len(binary),
+            'encode_relative': encode_rate / reference_rate,
+            'decode_msgs': decode_rate,
+            'decode_bytes': decode_rate * len(binary),
+            'decode_relative': decode_rate / reference_rate,
+        })
+    return results
+
+
+def compare_codec(results, baseline, tolerance=0.1):
+    """
+    Compare codec results with a baseline
+    :param results: see bench_codec
+    :param baseline: earlier results
+    :param tolerance: fraction a rate may drop before it is a regression
+    :return: list of (case, key, baseline value, value, ratio, regressed);
+             a rate, relative to the reference workload, regresses when it
+             drops by more than the tolerance
+    """
+    old = dict((result['case'], result) for result in baseline)
+    rows = []
+    for result in results:
+        previous = old.get(result['case'])
+        if previous is None:
+            continue
+        for key in ('encode_relative', 'decode_relative'):
+            if previous.get(key) is None:
+                continue
+            ratio = result[key] / previous[key]
+            rows.append((result['case'], key, previous[key], result[key],
+                         ratio, ratio < 1 - tolerance))
+    return rows
+
+
+def codec_main(args):
+    messages = 20000
+    options = {'--save': None, '--baseline': None, '--tolerance': 0.1}
+    try:
+        while args:
+            arg = args.pop(0)
+            if arg in options:
+                options[arg] = args.pop(0)
+            else:
+                messages = int(arg)
+        tolerance = float(options['--tolerance'])
+    except (IndexError, ValueError):
+        print __doc__
+        return 1
+
+    results = bench_codec(messages)
+    print "%14s %6s %12s %12s %8s %12s %12s %8s" % (
+        "case", "bytes", "enc msg/s", "enc MB/s", "enc rel", "dec msg/s",
+        "dec MB/s", "dec rel")
+    for result in results:
+        print "%14s %6d %12.0f %12.2f %8.3f %12.0f %12.2f %8.3f" % (
+            result['case'], result['size'], result['encode_msgs'],
+            result['encode_bytes'] / 1e6, result['encode_relative'],
+            result['decode_msgs'], result['decode_bytes'] / 1e6,
+            result['decode_relative'])
+
+    if options['--save']:
+        with open(options['--save'], "w") as out:
+            json.dump(results, out, indent=2, sort_keys=True)
+
+    if options['--baseline']:
+        with open(options['--baseline']) as baseline:
+            rows = compare_codec(results, json.load(baseline), tolerance)
+        print
+        print "%14s %14s %12s %12s %8s" % (
+            "case", "measure", "baseline", "now", "ratio")
+        regressed = False
+        for case, key, old, new, ratio, worse in rows:
+            print "%14s %14s %12.3f %12.3f %8.2f%s" % (
+                case, key, old, new, ratio, " REGRESSED" if worse else "")
+            regressed = regressed or worse
+        if regressed:
+            return 1
+    return 0
+
+
+def main(argv):
+    if len(argv) < 2 or argv[1] not in ("dispatch", "codec"):
+        print __doc__
+        return 1
+
+    if argv[1] == "codec":
+        return codec_main(argv[2:])
+
+    messages = 20000
+    if len(argv) > 2:
+        messages = int(argv[2])
+
+    print "%10s %12s %14s %14s %12s" % (
+        "handlers", "exact us", "wildcard us", "uncached us", "linear us")
+    for result in bench_dispatch(messages=messages):
+        print "%10d %12.2f %14.2f %14.2f %12.2f" % (
+            result['handlers'], result['exact_us'], result['wildcard_us'],
+            result['uncached_us'], result['linear_us'])
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -23,4 +23,6 @@ setup(
     data_files=DATA_FILES,
     options={'py2app': OPTIONS},
     setup_requires=['py2app', 'python-rtmidi' ],
+    # asyncosc / asynccontroller run on trollius, the asyncio backport
+    extras_require={'async': ['trollius']},
 )
@@ -0,0 +1,82 @@
+"""
+Mixer-side subscriptions with keepalive renewal
+"""
+import socket
+import threading
+import time
+import OSC
+
+
+class Subscription(threading.Thread):
+    """
+    Keeps a mixer subscription (e.g. /xremote) alive by re-sending its
+    request every `interval` seconds, before the mixer lets it expire.
+    """
+
+    def __init__(self, client, address, arguments=(), interval=8.0,
+                 expiry=10.0):
+        """
+        Initializer
+        :param client: OSC client to send the requests with
+        :param address: OSC address of the subscription request
+        :param arguments: arguments of the subscription request
+        :param interval: seconds between renewals
+        :param expiry: seconds the mixer keeps a subscription alive
+        :return:
+        """
+        message = OSC.OSCMessage(address)
+        for argument in arguments:
+            message.append(argument)
+        self.address = address
+        self.binary = message.getBinary()
+        self.client = client
+        self.interval = interval
+        self.expiry = expiry
+        self.renewals = 0
+        self.missed = 0
+        self.last_renewal = None
+        self.stopped = threading.Event()
+        super(Subscription, self).__init__()
+        self.daemon = True
+
+    def renew(self):
+        """
+        Send the subscription request. A renewal that fails, or comes after
+        the previous one has already expired, counts as missed.
+        :return:
+        """
+        now = time.time()
+        if self.last_renewal is not None and \
+                now - self.last_renewal > self.expiry:
+            self.missed += 1
+        try:
+            self.client.sendRaw(self.binary)
+        except (socket.error, OSC.OSCClientError):
+            self.missed += 1
+            return
+        self.renewals += 1
+        self.last_renewal = now
+
+    def run(self):
+        """
+        Thread run method
+        :return:
+        """
+        self.renew()
+        while not self.stopped.wait(self.interval):
+            self.renew()
+
+    def stop(self):
+        """
+        Stop renewing; the mixer drops the subscription once it expires
+        """
+        self.stopped.set()
+
+    def get_stats(self):
+        """
+        :return: dict with 'renewals', 'missed' and 'last_renewal'
+        """
+        return {
+            'renewals': self.renewals,
+            'missed': self.missed,
+            'last_renewal': self.last_renewal}
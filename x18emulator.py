@@ -0,0 +1,335 @@
+"""
+X18 / X-Air mixer emulator, for testing the controller without hardware.
+
+Usage:
+    python x18emulator.py [port] [--latency ms] [--loss fraction]
+                          [--rate packets/s] [--name name] [--seed n]
+                          [--address ip]
+
+--address is the IP /xinfo reports; by default, the address of the
+interface each client reaches the emulator through.
+"""
+import heapq
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import OSC
+from mixerstate import MixerState
+
+# seconds a /xremote or /meters subscription lasts without renewal
+SUBSCRIPTION_TIME = 10.0
+
+# parameter type tag, initial value, and how an int sent to it is scaled;
+# the inverse of what the x18mixer elements do with reported values
+PARAMETERS = {
+    'fader': ('f', 0.0, lambda value: (value + 1) / 1024.0),
+    'pan': ('f', 0.5, lambda value: value / 100.0),
+    'on': ('i', 1, int)}
+
+METER_COUNT = 40
+
+
+class X18Emulator(threading.Thread):
+    """
+    Answers /xinfo, stores and reports every parameter of the
+    mixerstate layout, pushes changes to /xremote subscribers, and sends
+    /meters blobs to meter subscribers. Replies can be delayed by
+    `latency` seconds, packets dropped with probability `loss`, and
+    incoming packets limited to `rate` per second.
+    """
+
+    def __init__(self, address=("127.0.0.1", 10024), name="XR18-emulator",
+                 model="XR18", version="1.17", latency=0.0, loss=0.0,
+                 rate=None, meter_interval=0.05, seed=None, echo=False,
+                 advertised=None):
+        """
+        Initializer
+        :param address: (host, port) to listen on
+        :param name: mixer name reported by /xinfo
+        :param model:
+        :param version:
+        :param latency: seconds before each reply or push is sent
+        :param loss: probability of dropping each packet, in and out
+        :param rate: incoming packets per second, or None for no limit
+        :param meter_interval: seconds between meter blobs
+        :param seed: random seed, for repeatable loss and meter values
+        :param echo: also report sets back to the client that sent them
+        :param advertised: IP reported by /xinfo, or None for the address
+                           the client reached
+        :return:
+        """
+        self.server = OSC.OSCServer(address)
+        self.server.addMsgHandler('default', self.handle)
+        self.mixer_name = name
+        self.model = model
+        self.version = version
+        self.latency = latency
+        self.loss = loss
+        self.rate = rate
+        self.meter_interval = meter_interval
+        self.echo = echo
+        self.advertised = advertised
+        self.local_addresses = {}
+        self.random = random.Random(seed)
+        self.values = {}
+        self.parameters = {}
+        for strip, number, parameter, osc_address in MixerState().items():
+            tag, initial, scale = PARAMETERS[parameter]
+            self.parameters[osc_address] = parameter
+            self.values[osc_address] = (tag, initial)
+        self.xremote = {}
+        self.meters = {}
+        self.levels = {}
+        self.outbox = []
+        self.condition = threading.Condition()
+        self.tokens = rate
+        self.refilled = time.time()
+        self.active = False
+        self.received = 0
+        self.replies = 0
+        self.pushes = 0
+        self.meter_frames = 0
+        self.lost = 0
+        self.limited = 0
+        self.server_thread = threading.Thread(target=self.server.serve_forever)
+        self.server_thread.daemon = True
+        super(X18Emulator, self).__init__()
+        self.daemon = True
+
+    def address(self):
+        """
+        :return: the (host, port) the emulator listens on
+        """
+        return self.server.address()
+
+    def local_address(self, client_address):
+        """
+        The IP a client reaches the emulator at: the advertised address, the
+        bound address, or, when bound to all interfaces, the address of the
+        interface the kernel replies to the client through
+        :param client_address: (host, port)
+        :return:
+        """
+        if self.advertised:
+            return self.advertised
+        host = self.address()[0]
+        if host != "0.0.0.0":
+            return host
+        local = self.local_addresses.get(client_address[0])
+        if local is None:
+            # connecting a UDP socket sends nothing, it only picks a route
+            probe = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                probe.connect((client_address[0], client_address[1] or 9))
+                local = probe.getsockname()[0]
+            except socket.error:
+                local = host
+            finally:
+                probe.close()
+            self.local_addresses[client_address[0]] = local
+        return local
+
+    def handle(self, addr, tags, data, client_address):
+        """
+        'default' handler: every message comes through here
+        """
+        self.received += 1
+        if self.rate is not None and not self._take_token():
+            self.limited += 1
+            return
+        if self.loss and self.random.random() < self.loss:
+            self.lost += 1
+            return
+
+        now = time.time()
+        if addr == "/xinfo":
+            self.reply(client_address, addr, [
+                self.local_address(client_address), self.mixer_name,
+                self.model, self.version])
+        elif addr == "/xremote":
+            self.xremote[client_address] = now + SUBSCRIPTION_TIME
+        elif addr == "/meters":
+            if data:
+                self.meters[(client_address, data[0])] = \
+                    now + SUBSCRIPTION_TIME
+        elif not data:
+            if addr in self.values:
+                tag, value = self.values[addr]
+                self.reply(client_address, addr, [value], tag)
+        else:
+            self.store(addr, tags, data, client_address)
+
+    def store(self, addr, tags, data, client_address):
+        """
+        Store a set and push it to the other /xremote subscribers
+        """
+        value = data[0]
+        tag = tags[0] if tags else 'i'
+        parameter = self.parameters.get(addr)
+        if parameter is not None:
+            tag, initial, scale = PARAMETERS[parameter]
+            if isinstance(value, int) and tag == 'f':
+                value = scale(value)
+            elif tag == 'i':
+                value = int(value)
+        self.values[addr] = (tag, value)
+        if self.echo and client_address is not None:
+            self.reply(client_address, addr, [value], tag)
+        now = time.time()
+        for subscriber, expires in self.xremote.items():
+            if expires < now:
+                self.xremote.pop(subscriber, None)
+            elif subscriber != client_address:
+                self.pushes += 1
+                self.reply(subscriber, addr, [value], tag)
+
+    def set(self, addr, value):
+        """
+        Change a value as if it was moved on the mixer itself
+        :param addr: OSC address
+        :param value: value in the parameter's own type
+        :return:
+        """
+        tag = self.values.get(addr, ('f', None))[0]
+        self.store(addr, tag, [value], None)
+
+    def reply(self, client_address, addr, arguments, tag=None):
+        """
+        Send a message, after `latency` seconds
+        """
+        message = OSC.OSCMessage(addr)
+        for argument in arguments:
+            message.append(argument, tag)
+        self._send(message.getBinary(), client_address)
+        self.replies += 1
+
+    def _send(self, binary, client_address):
+        if self.loss and self.random.random() < self.loss:
+            self.lost += 1
+            return
+        if not self.latency:
+            self.server.socket.sendto(binary, client_address)
+            return
+        with self.condition:
+            heapq.heappush(self.outbox,
+                           (time.time() + self.latency, binary, client_address))
+            self.condition.notify()
+
+    def _take_token(self):
+        now = time.time()
+        self.tokens = min(self.rate, self.tokens +
+                          (now - self.refilled) * self.rate)
+        self.refilled = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def meter_blob(self, bank):
+        """
+        A meter blob for the bank: int32 LE count, then int16 LE values
+        in 1/256 dB, random-walking between -90 and 0 dB
+        """
+        levels = self.levels.get(bank)
+        if levels is None:
+            levels = self.levels[bank] = [-40.0] * METER_COUNT
+        for i, level in enumerate(levels):
+            levels[i] = min(0.0, max(-90.0, level +
+                                     self.random.uniform(-3.0, 3.0)))
+        return struct.pack('<i%dh' % METER_COUNT, METER_COUNT,
+                           *[int(level * 256) for level in levels])
+
+    def run(self):
+        """
+        Thread run method: serves requests, and sends delayed replies and
+        meter blobs
+        :return:
+        """
+        self.active = True
+        self.server_thread.start()
+        next_meters = time.time()
+        with self.condition:
+            while self.active:
+                now = time.time()
+                while self.outbox and self.outbox[0][0] <= now:
+                    due, binary, client_address = heapq.heappop(self.outbox)
+                    self.server.socket.sendto(binary, client_address)
+                if now >= next_meters:
+                    next_meters = now + self.meter_interval
+                    for key, expires in self.meters.items():
+                        if expires < now:
+                            self.meters.pop(key, None)
+                            continue
+                        client_address, bank = key
+                        message = OSC.OSCMessage(bank)
+                        message.append(self.meter_blob(bank), 'b')
+                        self.meter_frames += 1
+                        self._send(message.getBinary(), client_address)
+                wake = next_meters
+                if self.outbox and self.outbox[0][0] < wake:
+                    wake = self.outbox[0][0]
+                self.condition.wait(max(wake - now, 0.0))
+
+    def stop(self):
+        """
+        Stop the emulator and close its socket
+        """
+        with self.condition:
+            self.active = False
+            self.condition.notify()
+        self.server.close()
+        self.server_thread.join()
+
+    def get_stats(self):
+        """
+        :return: dict of counters
+        """
+        return {
+            'received': self.received,
+            'replies': self.replies,
+            'pushes': self.pushes,
+            'meter_frames': self.meter_frames,
+            'lost': self.lost,
+            'limited': self.limited,
+            'subscribers': len(self.xremote)}
+
+
+def main(argv):
+    options = {'--latency': 0.0, '--loss': 0.0, '--rate': None,
+               '--name': "XR18-emulator", '--seed': None, '--address': None}
+    port = 10024
+    args = argv[1:]
+    try:
+        while args:
+            arg = args.pop(0)
+            if arg in options:
+                options[arg] = args.pop(0)
+            else:
+                port = int(arg)
+        emulator = X18Emulator(
+            ("0.0.0.0", port), name=options['--name'],
+            latency=float(options['--latency']) / 1000.0,
+            loss=float(options['--loss']),
+            rate=options['--rate'] and float(options['--rate']),
+            seed=options['--seed'] and int(options['--seed']),
+            advertised=options['--address'])
+    except (IndexError, ValueError):
+        print __doc__
+        return 1
+
+    emulator.start()
+    print "Emulating", emulator.mixer_name, "on port", port
+    try:
+        while True:
+            time.sleep(10)
+            print emulator.get_stats()
+    except KeyboardInterrupt:
+        emulator.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -1,26 +1,75 @@
+import time
 import OSC
 
 
-class MixerElement:
+class MixerElement(object):
     """
     Mixer Element class. Represents a channel, return, dca, bus etc.
+
+    Keeps the value the mixer last reported (value, confirmed_at) and the
+    value last sent but not yet reported back (pending, pending_at). set()
+    skips values equal to either, until they are older than stale_after
+    seconds. Any report from the mixer clears pending, since it is newer
+    than the set; later sets compare with the reported value.
+
+    With a MixerState, value and confirmed_at live in the state's arrays.
     """
 
-    def __init__(self, address, client, server, callback=None):
+    # seconds a confirmed or pending value suppresses identical sets
+    stale_after = 1.0
+
+    def __init__(self, address, client, server, callback=None,
+                 coalescer=None, state=None):
         """
         Initializer
         :param address:
+        :param coalescer: optional Coalescer set() values are sent through
+        :param state: optional MixerState holding the element's value
         :return:
         """
         self.address = address
+        self.coalescer = coalescer
         self.server = server
         if callback is not None:
             self.callback = callback
         else:
             self.callback = self._empty_callback
-        self.value = None
+        self.state = state
+        if state is not None:
+            self.values, self.times, self.slot = state.bind(address)
+        else:
+            self.values, self.times, self.slot = [None], [0], 0
+        self.pending = None
+        self.pending_at = 0
+        self.suppressed = 0
         self.server.addMsgHandler(self.address, self.handler)
         self.client = client
+        # address and typetags are encoded once; get/set only pack the value
+        self.get_binary = OSC.OSCMessageTemplate(self.address).getBinary()
+        self.set_template = OSC.OSCMessageTemplate(self.address, "i")
+
+    def _get_value(self):
+        value = self.values[self.slot]
+        if value is None or value != value:
+            return None
+        if self.state is not None:
+            return int(value)
+        return value
+
+    def _set_value(self, value):
+        if value is None and self.state is not None:
+            value = float('nan')
+        self.values[self.slot] = value
+
+    value = property(_get_value, _set_value)
+
+    def _get_confirmed_at(self):
+        return self.times[self.slot]
+
+    def _set_confirmed_at(self, when):
+        self.times[self.slot] = when
+
+    confirmed_at = property(_get_confirmed_at, _set_confirmed_at)
 
     def value_convert(self, value):
         """
@@ -41,16 +90,21 @@ class MixerElement:
         :param device:
         :return:
         """
+        now = time.time()
         self.value = self.value_convert(response[0])
-        self.callback(call, param, response, device)
+        self.confirmed_at = now
+        # the report is newer than our set: it either confirms it or
+        # another client changed the value since, e.g. via /xremote
+        self.pending = None
+        if self.state is not None:
+            self.state.reported(self.address, self.value)
+        return self.callback(call, param, response, device)
 
     def get(self):
         """
         Get the message from the behringer
         """
-        oscmsg = OSC.OSCMessage()
-        oscmsg.setAddress(self.address)
-        self.send(oscmsg)
+        self.send_binary(self.get_binary)
 
     def set(self, value=None):
         """
@@ -58,12 +112,47 @@ class MixerElement:
         :param value:
         :return:
         """
-        #        if value != self.value:
-        oscmsg = OSC.OSCMessage()
-        oscmsg.setAddress(self.address)
-        if value is not None:
-            oscmsg.append(int(value))
-        self.send(oscmsg)
+        if value is None:
+            self.send_binary(self.get_binary)
+            return
+
+        value = int(value)
+        now = time.time()
+        if self.pending is not None:
+            if value == self.pending and \
+                    now - self.pending_at < self.stale_after:
+                self.suppressed += 1
+                return
+        elif value == self.value and \
+                now - self.confirmed_at < self.stale_after:
+            self.suppressed += 1
+            return
+
+        self.pending = value
+        self.pending_at = now
+        if self.coalescer is not None:
+            self.coalescer.submit(
+                self.address, self.set_template.getBinary(value))
+        else:
+            self.send_binary(self.set_template.getBinary(value))
+
+    def lost(self):
+        """
+        Forget the pending value, whose packet was never sent, so setting
+        it again is not suppressed
+        :return:
+        """
+        self.pending = None
+        self.pending_at = 0
+
+    def invalidate(self):
+        """
+        Forget the confirmed and pending values, so the next set() is sent
+        :return:
+        """
+        self.confirmed_at = 0
+        self.pending = None
+        self.pending_at = 0
 
     def _empty_callback(self, call, param, response, device):
         pass
@@ -75,12 +164,23 @@ class MixerElement:
         """
         self.client.send(message)
 
+    def send_binary(self, binary):
+        """
+        Send an already encoded OSC message
+        :param binary:
+        :return:
+        """
+        self.client.sendRaw(binary)
+
 
 class SnapElement(MixerElement):
     """
     Handle snapshots
     """
 
+    # reloading the current snapshot is a real request; never suppress it
+    stale_after = 0
+
     def __init__(self, address, client, server, callback=None):
         """
         Initializer
@@ -90,6 +190,8 @@ class SnapElement(MixerElement):
         MixerElement.__init__(self, address, client, server, callback)
         self.response_address = "/-snap/index"
         self.server.addMsgHandler(self.response_address, self.handler)
+        self.response_binary = OSC.OSCMessageTemplate(
+            self.response_address).getBinary()
 
     def get(self):
         """
@@ -97,9 +199,7 @@ class SnapElement(MixerElement):
         :return:
         """
 
-        oscmsg = OSC.OSCMessage()
-        oscmsg.setAddress(self.response_address)
-        self.send(oscmsg)
+        self.send_binary(self.response_binary)
 
 
 class FaderElement(MixerElement):